@@ -1,39 +1,9 @@
+import os
 import sys
 
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
 
-class IOB:
-    def __init__(self, sep=" "):
-        self._sep = sep
-
-    def parse_file(self, ifile):
-        return [
-            self._parse_sentence(raw)
-            for raw in self._read_sentences_from_file(ifile)
-        ]
-
-    def _parse_sentence(self, raw_sentence):
-        return [
-            tuple(token.split(self._sep))
-            for token in raw_sentence.strip().split("\n")
-        ]
-
-    def _read_sentences_from_file(self, ifile):
-        raw_sentence = ""
-        try:
-            with open(ifile) as fhi:
-                for line in fhi:
-                    if line == "\n":
-                        if raw_sentence == "":
-                            continue
-                        yield raw_sentence
-                        raw_sentence = ""
-                        continue
-
-                    if line:
-                        raw_sentence += line
-
-            if raw_sentence:
-                yield raw_sentence
-        except IOError:
-            print("Unable to read file: " + ifile)
-            sys.exit()
+from iobtools import (  # noqa: E402,F401
+    IOB, IOBWriter, Corpus, open_text
+)
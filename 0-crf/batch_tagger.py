@@ -0,0 +1,160 @@
+"""
+Batched tagging with NumPy, from the weights of a crfsuite model.
+
+crf.predict() tags one sentence at a time, from feature dicts that the
+crfsuite bindings convert one item at a time. BatchTagger tags a chunk of
+sentences at once from the sentences themselves, without feature dicts:
+
+- the word attributes of each distinct word of the chunk are computed
+  once, and the model attribute of every feature (template) of each
+  distinct word is looked up once, so the attribute ids of the features
+  of all the tokens are gathered from small tables
+- the state scores of the tokens are the sum, feature by feature in the
+  order of the feature dicts, of the weights of those attributes, which is
+  the order in which crfsuite adds them
+- the labels are found by a Viterbi over padded batches of sentences,
+  with the tie rule of crfsuite (npcrf.decode())
+
+so the labels are exactly the ones of crf.predict().
+"""
+import numpy as np
+from crfsuite_model import model_bytes, read_model
+from features import pos_map
+from npcrf import decode
+
+
+def _factorize(values: list) -> tuple:
+    """Returns the distinct values of a list and the index of each item"""
+    distinct = list(dict.fromkeys(values))
+    index = {v: i for i, v in enumerate(distinct)}
+    return distinct, np.fromiter(
+        map(index.__getitem__, values), dtype=np.int64, count=len(values))
+
+
+class BatchTagger:
+    """
+    Tagger of the features feats (a CRFFeatures) with the given labels,
+    attributes and weights (state: attributes x labels, transitions:
+    labels x labels)
+    """
+    def __init__(self, labels, attributes, state, transitions, feats):
+        self.labels = list(labels)
+        self.feats = feats
+        self._ids = {a: i for i, a in enumerate(attributes)}
+        # unknown attributes and missing features point to a row of zeros
+        self._unknown = len(self._ids)
+        self._state = np.vstack([
+            np.asarray(state, dtype=np.float64),
+            np.zeros((1, len(self.labels)))])
+        self._transitions = np.asarray(transitions, dtype=np.float64)
+
+        extractor = feats._extractor
+        self._features = extractor.features
+        self._hash_mask = None
+        if extractor.hash_bits is not None:
+            self._hash_mask = (1 << extractor.hash_bits) - 1
+        names = [name for name, _, _ in self._features]
+        if len(set(names)) < len(names):
+            # a later feature would replace the value of an earlier one
+            raise ValueError("feature templates with repeated features")
+
+    @classmethod
+    def from_model(cls, model, feats):
+        """
+        Returns the tagger of a sklearn_crfsuite.CRF (from the weights of
+        its crfsuite model) or of an AveragedPerceptron
+        """
+        if hasattr(model, 'state_'):
+            return cls(model.classes_, model.attributes_, model.state_,
+                       model.transitions_, feats)
+        weights = read_model(model_bytes(model))
+        return cls(weights.labels, weights.attributes, weights.state,
+                   weights.transitions, feats)
+
+    def _table(self, name: str, values: list, is_string: bool):
+        """
+        Returns the attribute ids of a feature for a list of distinct
+        values, as pycrfsuite converts them
+        """
+        ids = self._ids
+        if not is_string:
+            found = ids.get(name, self._unknown)
+            return np.array(
+                [found if v else self._unknown for v in values],
+                dtype=np.int64)
+        if self._hash_mask is not None:
+            name_hash = self.feats._extractor.hash_value(name)
+            keys = [str((v ^ name_hash) & self._hash_mask) for v in values]
+        else:
+            keys = [f"{name}:{v}" for v in values]
+        return np.fromiter(
+            (ids.get(k, self._unknown) for k in keys),
+            dtype=np.int64, count=len(keys))
+
+    def emissions(self, sentences) -> tuple:
+        """
+        Returns the state scores of all the tokens of a list of sentences
+        (tokens x labels) and the first token and length of each sentence
+        """
+        lengths = np.array([len(s) for s in sentences], dtype=np.int64)
+        starts = np.zeros(len(sentences) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=starts[1:])
+        n_tokens = int(starts[-1])
+        position = np.arange(n_tokens) - np.repeat(starts[:-1], lengths)
+        last = np.repeat(lengths - 1, lengths)
+
+        # distinct words and PoS tags, and the code of each token
+        tokens = [t for s in sentences for t in s]
+        words, word_codes = _factorize([t[0] for t in tokens])
+        columns = list(zip(*map(self.feats._word_attributes, words))) \
+            or [()] * self.feats._extractor.n_attributes
+        if self.feats._extractor.uses_pos:
+            if any(len(t) < 2 for t in tokens):
+                raise Exception(
+                    "With PoS option, the dataset must have two fields.")
+            postags, tag_codes = _factorize(
+                [pos_map.get(t[1], 'X') for t in tokens])
+            if self._hash_mask is not None:
+                postags = [self.feats._pos_hashes[tag] for tag in postags]
+
+        # attribute id of every feature of every token. Feature values are
+        # 1 or booleans, and crfsuite adds weight * value: a feature with
+        # value 0 adds nothing, so it points to the row of zeros
+        ids = np.full((n_tokens, len(self._features)), self._unknown)
+        namespace = {'i': position, 'last': last}
+        for f, (name, value, condition) in enumerate(self._features):
+            rows = np.arange(n_tokens)
+            if condition is not None:
+                rows = rows[eval(condition, {}, namespace)]
+            if not isinstance(value, tuple):
+                if value:
+                    ids[rows, f] = self._ids.get(name, self._unknown)
+                continue
+            column, offset, is_string = value
+            if column is None:
+                table, codes = postags, tag_codes
+            else:
+                table, codes = columns[column], word_codes
+            ids[rows, f] = self._table(name, table, is_string)[
+                codes[rows + offset]]
+
+        if self._hash_mask is not None:
+            # a dict keeps one of the features with the same key, and
+            # hashed features can collide: the later ones are dropped
+            for f in range(1, len(self._features)):
+                repeated = (ids[:, :f] == ids[:, f, None]).any(axis=1) \
+                    & (ids[:, f] != self._unknown)
+                ids[repeated, f] = self._unknown
+
+        emissions = np.zeros((n_tokens, len(self.labels)))
+        for f in range(len(self._features)):
+            emissions += self._state[ids[:, f]]
+        return emissions, starts, lengths
+
+    def tag(self, sentences, batch_size: int = 512) -> list:
+        """Returns the labels of every token of a list of sentences"""
+        sentences = list(sentences)
+        emissions, starts, lengths = self.emissions(sentences)
+        paths = decode(
+            emissions, starts, lengths, self._transitions, batch_size)
+        return [[self.labels[k] for k in path] for path in paths]
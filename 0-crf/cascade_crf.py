@@ -0,0 +1,280 @@
+import argparse
+import os
+import shlex
+import subprocess
+import sys
+import tempfile
+import time
+from itertools import islice
+from seqeval.metrics import f1_score
+from features import (
+    FeaturePool, add_feature_arguments, features_from_args
+)
+from crfsuite_model import load_crf
+from config import version
+from IOB import IOB, IOBWriter
+
+
+def parse_args():
+    description = "Tag an IOB2 dataset with a CRF model, and only the " \
+                  "sentences it is unsure of with a slower, more accurate " \
+                  "model."
+
+    parser = argparse.ArgumentParser(
+        description=description,
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter
+    )
+    heavy = parser.add_mutually_exclusive_group(required=True)
+    heavy.add_argument(
+        '--spacy',
+        type=str,
+        metavar='MODEL',
+        help='spaCy NER model for the escalated sentences',
+    )
+    heavy.add_argument(
+        '--command',
+        type=str,
+        metavar='CMD',
+        help='command that tags the escalated sentences, an IOB2 file '
+             'given as {input}, and writes them in IOB2 format to {output} '
+             '(or to stdout, without {output})',
+    )
+
+    parser.add_argument(
+        '-V',
+        '--version',
+        action='version',
+        version=f'%(prog)s {version}'
+    )
+    add_feature_arguments(parser)
+    parser.add_argument(
+        '-m',
+        '--model',
+        default='crf.model',
+        type=str,
+        metavar='FILE',
+        help='CRF model file (pickle or crfsuite format)',
+    )
+    parser.add_argument(
+        '-t',
+        '--threshold',
+        default=0.9,
+        type=float,
+        metavar='P',
+        help='escalate the sentences with a token whose label has a '
+             'marginal probability below P',
+    )
+    parser.add_argument(
+        '-b',
+        '--batch-size',
+        default=256,
+        type=int,
+        metavar='N',
+        help='batch size of the spaCy model',
+    )
+    parser.add_argument(
+        '-c',
+        '--chunk-size',
+        default=1000,
+        type=int,
+        metavar='N',
+        help='number of sentences tagged and written at a time; the '
+             'heavy model command is run once per chunk',
+    )
+    parser.add_argument(
+        '-w',
+        '--workers',
+        type=int,
+        default=1,
+        help='number of processes used to compute the features',
+    )
+    parser.add_argument(
+        '-e',
+        '--evaluate',
+        action='store_true',
+        default=False,
+        help='use the labels of the dataset as gold standard and report '
+             'the F1 of the CRF and of the cascade',
+    )
+    parser.add_argument(
+        '-o',
+        '--output',
+        type=str,
+        metavar='FILE',
+        help='output file (default: stdout); .gz, .bz2, .xz and .zst '
+             'files are compressed',
+    )
+    parser.add_argument(
+        'dataset',
+        metavar='input file',
+        type=str,
+        help='dataset file, in IOB2 format'
+    )
+    return parser.parse_args()
+
+
+def chunked(items, size):
+    """Groups an iterable into lists of up to size items"""
+    items = iter(items)
+    while True:
+        chunk = list(islice(items, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def tag_with_confidence(crf, X) -> tuple:
+    """
+    Returns the labels predicted by a CRF for the feature dicts X and the
+    confidence of each sentence: the lowest marginal probability of the
+    predicted labels of its tokens
+    """
+    tagger = crf.tagger_
+    y_pred, confidence = [], []
+    for xseq in X:
+        tagger.set(xseq)
+        yseq = tagger.tag()
+        y_pred.append(yseq)
+        confidence.append(min(
+            (tagger.marginal(y, i) for i, y in enumerate(yseq)),
+            default=1.0))
+    return y_pred, confidence
+
+
+class SpacyBackend:
+    """Tags tokenized sentences with the NER of a spaCy model"""
+    def __init__(self, model: str, batch_size: int):
+        import spacy
+        self._spacy = spacy
+        self._nlp = spacy.load(model)
+        self._batch_size = batch_size
+
+    def tag(self, sentences) -> list:
+        docs = (self._spacy.tokens.Doc(self._nlp.vocab, words)
+                for words in sentences)
+        return [
+            [token.ent_iob_ if token.ent_iob_ == 'O'
+             else f'{token.ent_iob_}-{token.ent_type_}' for token in doc]
+            for doc in self._nlp.pipe(docs, batch_size=self._batch_size)
+        ]
+
+
+class CommandBackend:
+    """
+    Tags tokenized sentences with a command that reads and writes IOB2
+    files, such as the predict scripts of the other models
+    """
+    def __init__(self, command: str):
+        self._command = command
+
+    def tag(self, sentences) -> list:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            ifile = os.path.join(tmpdir, 'input.iob')
+            ofile = os.path.join(tmpdir, 'output.iob')
+            with IOBWriter(ifile) as writer:
+                for words in sentences:
+                    writer.write_tagged(words, ['O'] * len(words))
+
+            # only the placeholders are replaced: the command may have
+            # other braces, such as awk programs or ${VAR}
+            command = shlex.split(
+                self._command.replace('{input}', shlex.quote(ifile))
+                .replace('{output}', shlex.quote(ofile)))
+            try:
+                if '{output}' in self._command:
+                    subprocess.run(command, check=True)
+                else:
+                    with open(ofile, 'w') as fho:
+                        subprocess.run(command, stdout=fho, check=True)
+            except (OSError, subprocess.CalledProcessError) as e:
+                print(f"Error: heavy model command failed: {e}",
+                      file=sys.stderr)
+                sys.exit(1)
+            return [[token[-1] for token in sent]
+                    for sent in IOB().parse_file(ofile)]
+
+
+def escalate(backend, chunk, y_pred, ids) -> int:
+    """
+    Replaces, in place, the labels of the sentences of a chunk at the given
+    positions with those of the heavy model, which tags them all at once.
+    Returns the number of sentences whose labels were not replaced because
+    the heavy model returned another number of tokens.
+    """
+    if not ids:
+        return 0
+    tags = backend.tag([[token[0] for token in chunk[i]] for i in ids])
+    if len(tags) != len(ids):
+        print("Error: the heavy model returned "
+              f"{len(tags)} sentences instead of {len(ids)}",
+              file=sys.stderr)
+        sys.exit(1)
+    mismatched = 0
+    for i, labels in zip(ids, tags):
+        if len(labels) == len(chunk[i]):
+            y_pred[i] = labels
+        else:
+            mismatched += 1
+    return mismatched
+
+
+args = parse_args()
+if args.chunk_size < 1 or args.batch_size < 1:
+    print("Error: chunk and batch sizes must be positive numbers",
+          file=sys.stderr)
+    sys.exit(1)
+
+iob = IOB()
+crf = load_crf(args.model)
+if not hasattr(crf, 'tagger_'):
+    print("Error: the model has no marginal probabilities, "
+          "a CRF model is needed", file=sys.stderr)
+    sys.exit(1)
+feats = features_from_args(args)
+if args.spacy:
+    backend = SpacyBackend(args.spacy, args.batch_size)
+else:
+    backend = CommandBackend(args.command)
+
+n_sentences = n_escalated = n_mismatched = 0
+crf_seconds = heavy_seconds = 0.0
+y_true, y_crf, y_cascade = [], [], []
+# the feature workers are forked once, and keep their memo for all chunks
+with IOBWriter(args.output) as writer, \
+        FeaturePool(feats, args.workers) as pool:
+    for chunk in chunked(iob.iter_file(args.dataset), args.chunk_size):
+        start = time.perf_counter()
+        X = feats.sents2features(chunk, pool=pool)
+        y_pred, confidence = tag_with_confidence(crf, X)
+        crf_seconds += time.perf_counter() - start
+        if args.evaluate:
+            y_true += [feats.sent2labels(s) for s in chunk]
+            y_crf += [list(labels) for labels in y_pred]
+
+        start = time.perf_counter()
+        ids = [i for i, p in enumerate(confidence) if p < args.threshold]
+        n_mismatched += escalate(backend, chunk, y_pred, ids)
+        heavy_seconds += time.perf_counter() - start
+        n_sentences += len(chunk)
+        n_escalated += len(ids)
+        if args.evaluate:
+            y_cascade += [list(labels) for labels in y_pred]
+
+        for sentence, tags in zip(chunk, y_pred):
+            writer.write_tagged([token[0] for token in sentence], tags)
+        writer.flush()
+
+seconds = crf_seconds + heavy_seconds
+print(f"sentences: {n_sentences}", file=sys.stderr)
+print("escalated: {} ({:.1%})".format(
+    n_escalated, n_escalated / max(n_sentences, 1)), file=sys.stderr)
+if n_mismatched:
+    print(f"escalated sentences kept with the CRF labels (token "
+          f"mismatch): {n_mismatched}", file=sys.stderr)
+print("CRF: {:.2f}s, heavy model: {:.2f}s, {:.0f} sentences/s".format(
+    crf_seconds, heavy_seconds, n_sentences / max(seconds, 1e-9)),
+    file=sys.stderr)
+if args.evaluate:
+    print("F1 CRF: {:.4f}, cascade: {:.4f}".format(
+        f1_score(y_true, y_crf), f1_score(y_true, y_cascade)),
+        file=sys.stderr)
@@ -1,8 +1,9 @@
 import argparse
 import eli5
-import pickle
 import sys
+import sklearn_crfsuite
 from config import version
+from crfsuite_model import load_crf
 
 
 def parse_args():
@@ -24,20 +25,23 @@ def parse_args():
         default='crf.model',
         type=str,
         metavar='FILE',
-        help='model file'
+        help='model file (pickle or crfsuite format)'
     )
     return parser.parse_args()
 
 
 args = parse_args()
 try:
-    crf = pickle.load(open(args.model, 'rb'))
+    crf = load_crf(args.model)
 except FileNotFoundError:
     print("Error: file {} was not found".format(args.model))
     sys.exit(1)
 except Exception:
     print("Error: unable to load the model in {}".format(args.model))
     sys.exit(127)
+if not isinstance(crf, sklearn_crfsuite.CRF):
+    print("Error: {} is not a CRF model".format(args.model), file=sys.stderr)
+    sys.exit(1)
 
 explain = eli5.explain_weights(crf)
 print(eli5.format_as_text(explain))
@@ -0,0 +1,296 @@
+"""
+Reader and writer of crfsuite model files.
+
+crfsuite cannot start training from given weights nor change the weights
+of a model, so the tools that do (warm-start training, pruning) read the
+weights of a model with read_model(), work on them with NumPy and write
+a new model file with CRFSuiteModel.save(). The file is the one crfsuite
+writes (CRF1d model, with CQDB string tables hashed with lookup3), so it
+can be loaded by pycrfsuite.Tagger or wrapped in a sklearn_crfsuite.CRF
+with to_crf().
+
+The scripts that tag accept either a pickled sklearn_crfsuite.CRF or a
+model file written by crfsuite (see load_crf()). The latter is opened
+directly by the crfsuite tagger, without unpickling the estimator nor
+copying the model to a temporary file first.
+
+Layout (little endian)::
+
+    header      magic, size, type, version, counts and chunk offsets
+    FEAT        features: type (0 state, 1 transition), src, dst, weight
+    CQDB        label strings
+    CQDB        attribute strings
+    LFRF        transition features of each label
+    AFRF        state features of each attribute
+"""
+import pickle
+import shutil
+import struct
+import numpy as np
+import sklearn_crfsuite
+
+_HEADER = struct.Struct("<4sI4sIIIIIIIII")
+_CHUNK = struct.Struct("<4sII")
+_FEATURE = struct.Struct("<IIId")
+_CQDB_HEADER = struct.Struct("<4sIIIII")
+_CQDB_TABLES = 256
+_BYTEORDER_CHECK = 0x62445371
+_MASK = 0xFFFFFFFF
+
+
+def _rot(x, k):
+    return ((x << k) | (x >> (32 - k))) & _MASK
+
+
+def _mix(a, b, c):
+    a = (a - c) & _MASK; a ^= _rot(c, 4); c = (c + b) & _MASK  # noqa: E702
+    b = (b - a) & _MASK; b ^= _rot(a, 6); a = (a + c) & _MASK  # noqa: E702
+    c = (c - b) & _MASK; c ^= _rot(b, 8); b = (b + a) & _MASK  # noqa: E702
+    a = (a - c) & _MASK; a ^= _rot(c, 16); c = (c + b) & _MASK  # noqa: E702
+    b = (b - a) & _MASK; b ^= _rot(a, 19); a = (a + c) & _MASK  # noqa: E702
+    c = (c - b) & _MASK; c ^= _rot(b, 4); b = (b + a) & _MASK  # noqa: E702
+    return a, b, c
+
+
+def _final(a, b, c):
+    c ^= b; c = (c - _rot(b, 14)) & _MASK  # noqa: E702
+    a ^= c; a = (a - _rot(c, 11)) & _MASK  # noqa: E702
+    b ^= a; b = (b - _rot(a, 25)) & _MASK  # noqa: E702
+    c ^= b; c = (c - _rot(b, 16)) & _MASK  # noqa: E702
+    a ^= c; a = (a - _rot(c, 4)) & _MASK  # noqa: E702
+    b ^= a; b = (b - _rot(a, 14)) & _MASK  # noqa: E702
+    c ^= b; c = (c - _rot(b, 24)) & _MASK  # noqa: E702
+    return c
+
+
+def hashlittle(key: bytes, initval: int = 0) -> int:
+    """Bob Jenkins' lookup3 hash, as used by the CQDB tables of crfsuite"""
+    length = len(key)
+    a = b = c = (0xdeadbeef + length + initval) & _MASK
+    pos = 0
+    while length > 12:
+        x, y, z = struct.unpack_from("<III", key, pos)
+        a, b, c = _mix((a + x) & _MASK, (b + y) & _MASK, (c + z) & _MASK)
+        pos += 12
+        length -= 12
+    if length == 0:
+        return c
+    tail = key[pos:] + bytes(12 - length)
+    x, y, z = struct.unpack("<III", tail)
+    return _final((a + x) & _MASK, (b + y) & _MASK, (c + z) & _MASK)
+
+
+def _write_cqdb(strings: list) -> bytes:
+    records = []
+    tables = [[] for _ in range(_CQDB_TABLES)]
+    bwd = []
+    offset = _CQDB_HEADER.size + 8 * _CQDB_TABLES
+    for i, string in enumerate(strings):
+        key = string.encode("utf-8") + b"\0"
+        hv = hashlittle(key)
+        tables[hv % _CQDB_TABLES].append((hv, offset))
+        bwd.append(offset)
+        record = struct.pack("<II", i, len(key)) + key
+        records.append(record)
+        offset += len(record)
+
+    refs = []
+    buckets = []
+    for table in tables:
+        if not table:
+            refs.append((0, 0))
+            continue
+        n = len(table) * 2
+        slots = [(0, 0)] * n
+        for hv, off in table:
+            k = (hv >> 8) % n
+            while slots[k][1]:
+                k = (k + 1) % n
+            slots[k] = (hv, off)
+        refs.append((offset, n))
+        buckets.append(b"".join(struct.pack("<II", *s) for s in slots))
+        offset += 8 * n
+
+    bwd_offset = offset
+    size = offset + 4 * len(bwd)
+    return b"".join([
+        _CQDB_HEADER.pack(
+            b"CQDB", size, 0, _BYTEORDER_CHECK, len(bwd), bwd_offset),
+        b"".join(struct.pack("<II", *ref) for ref in refs),
+        *records,
+        *buckets,
+        struct.pack(f"<{len(bwd)}I", *bwd),
+        # the next chunk starts at a 4-byte boundary
+        bytes(-size % 4),
+    ])
+
+
+def _read_cqdb(data: bytes, start: int) -> list:
+    chunk, _, _, byteorder, n, bwd_offset = _CQDB_HEADER.unpack_from(
+        data, start)
+    if chunk != b"CQDB" or byteorder != _BYTEORDER_CHECK:
+        raise ValueError("invalid string table in crfsuite model")
+    strings = []
+    for offset in struct.unpack_from(f"<{n}I", data, start + bwd_offset):
+        _, size = struct.unpack_from("<II", data, start + offset)
+        key = data[start + offset + 8:start + offset + 8 + size - 1]
+        strings.append(key.decode("utf-8"))
+    return strings
+
+
+def _write_refs(chunk: bytes, lists: list, start: int) -> bytes:
+    offset = start + _CHUNK.size + 4 * len(lists)
+    offsets = []
+    body = []
+    for fids in lists:
+        if fids is None:
+            offsets.append(0)
+            continue
+        offsets.append(offset)
+        body.append(struct.pack(f"<I{len(fids)}I", len(fids), *fids))
+        offset += 4 * (len(fids) + 1)
+    size = offset - start
+    return b"".join([
+        _CHUNK.pack(chunk, size, len(lists)),
+        struct.pack(f"<{len(offsets)}I", *offsets),
+        *body,
+    ])
+
+
+class CRFSuiteModel:
+    """
+    Weights of a crfsuite model: labels and attributes (lists of strings),
+    state weights (a dense attributes x labels matrix) and transition
+    weights (a labels x labels matrix, from the previous label to the
+    current one). Zero weights are not features of the model.
+    """
+    def __init__(
+            self,
+            labels: list,
+            attributes: list,
+            state: np.ndarray,
+            transitions: np.ndarray):
+        self.labels = list(labels)
+        self.attributes = list(attributes)
+        self.state = np.asarray(state, dtype=np.float64)
+        self.transitions = np.asarray(transitions, dtype=np.float64)
+
+    @property
+    def num_features(self) -> int:
+        return int(np.count_nonzero(self.state)
+                   + np.count_nonzero(self.transitions))
+
+    def to_bytes(self) -> bytes:
+        """
+        Returns the model in crfsuite format. As crfsuite does, attributes
+        without any non-zero weight are left out.
+        """
+        active = np.flatnonzero(np.any(self.state != 0, axis=1))
+        state = self.state[active]
+        attributes = [self.attributes[a] for a in active]
+        n_labels = len(self.labels)
+
+        features = []
+        attr_refs = [[] for _ in attributes]
+        label_refs = [[] for _ in range(n_labels)] + [None, None]
+        for a, y in zip(*np.nonzero(state)):
+            attr_refs[a].append(len(features))
+            features.append(_FEATURE.pack(0, a, y, state[a, y]))
+        for y0, y1 in zip(*np.nonzero(self.transitions)):
+            label_refs[y0].append(len(features))
+            features.append(
+                _FEATURE.pack(1, y0, y1, self.transitions[y0, y1]))
+
+        feat = _CHUNK.pack(
+            b"FEAT", _CHUNK.size + _FEATURE.size * len(features),
+            len(features)) + b"".join(features)
+        off_features = _HEADER.size
+        off_labels = off_features + len(feat)
+        labels = _write_cqdb(self.labels)
+        off_attrs = off_labels + len(labels)
+        attrs = _write_cqdb(attributes)
+        off_labelrefs = off_attrs + len(attrs)
+        lrefs = _write_refs(b"LFRF", label_refs, off_labelrefs)
+        off_attrrefs = off_labelrefs + len(lrefs)
+        arefs = _write_refs(b"AFRF", attr_refs, off_attrrefs)
+        size = off_attrrefs + len(arefs)
+
+        header = _HEADER.pack(
+            b"lCRF", size, b"FOMC", 100, 0, n_labels, len(attributes),
+            off_features, off_labels, off_attrs, off_labelrefs, off_attrrefs)
+        return b"".join([header, feat, labels, attrs, lrefs, arefs])
+
+    def save(self, ofile: str) -> None:
+        with open(ofile, "wb") as fho:
+            fho.write(self.to_bytes())
+
+
+def read_model(data: bytes) -> CRFSuiteModel:
+    """Reads the weights of a model from the contents of a crfsuite file"""
+    (magic, _, mtype, _, _, n_labels, n_attrs, off_features, off_labels,
+     off_attrs, _, _) = _HEADER.unpack_from(data)
+    if magic != b"lCRF" or mtype != b"FOMC":
+        raise ValueError("not a crfsuite CRF1d model")
+    labels = _read_cqdb(data, off_labels)
+    attributes = _read_cqdb(data, off_attrs)
+    state = np.zeros((n_attrs, n_labels))
+    transitions = np.zeros((n_labels, n_labels))
+
+    _, _, n_features = _CHUNK.unpack_from(data, off_features)
+    features = np.frombuffer(
+        data, dtype=np.dtype([
+            ("type", "<u4"), ("src", "<u4"), ("dst", "<u4"),
+            ("weight", "<f8")]),
+        count=n_features, offset=off_features + _CHUNK.size)
+    is_state = features["type"] == 0
+    state[features["src"][is_state], features["dst"][is_state]] = \
+        features["weight"][is_state]
+    transitions[features["src"][~is_state], features["dst"][~is_state]] = \
+        features["weight"][~is_state]
+    return CRFSuiteModel(labels, attributes, state, transitions)
+
+
+def is_crfsuite_model(ifile: str) -> bool:
+    """Returns whether a file is a crfsuite model (and not a pickle)"""
+    with open(ifile, "rb") as fhi:
+        return fhi.read(4) == b"lCRF"
+
+
+def load_crf(ifile: str):
+    """
+    Loads a sklearn_crfsuite.CRF from a pickle or from a crfsuite model
+    file. The training parameters of a crfsuite model file are unknown,
+    so it can only be used to tag.
+    """
+    if not is_crfsuite_model(ifile):
+        with open(ifile, "rb") as fhi:
+            return pickle.load(fhi)
+    crf = sklearn_crfsuite.CRF(model_filename=ifile)
+    # the model is checked now rather than when tagging the first sentence
+    crf.tagger_
+    return crf
+
+
+def save_crfsuite_model(crf, ofile: str) -> None:
+    """Writes the model of a sklearn_crfsuite.CRF as a crfsuite file"""
+    shutil.copyfile(crf.modelfile.name, ofile)
+
+
+def model_bytes(crf) -> bytes:
+    """Returns the crfsuite model file of a sklearn_crfsuite.CRF"""
+    with open(crf.modelfile.name, "rb") as fhi:
+        return fhi.read()
+
+
+def to_crf(model: CRFSuiteModel, crf):
+    """
+    Returns a copy of the sklearn_crfsuite.CRF crf (for its parameters)
+    whose model is replaced by the given weights
+    """
+    # the model goes to a new temporary file, also when crf was loaded
+    # from a crfsuite file
+    new = type(crf)(**dict(crf.get_params(), model_filename=None))
+    # same as fit(), with the model file written here instead of crfsuite
+    new.modelfile.refresh()
+    model.save(new.modelfile.name)
+    return new
@@ -3,16 +3,18 @@ Script to perform kfold cross validation with a CRF model.
 """
 import argparse
 import csv
+import multiprocessing as mp
 import sys
 from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
 from operator import itemgetter
 from pprint import PrettyPrinter
 from statistics import pstdev, mean
 import sklearn_crfsuite
 from sklearn.model_selection import KFold
 from seqeval.metrics import classification_report as seq_classification_report
-from IOB import IOB
-from features import CRFFeatures
+from IOB import IOB, Corpus
+from features import add_feature_arguments, features_from_args
 from config import (
     version, shuffle, random_state, c1, c2, max_iterations,
     all_possible_transitions
@@ -42,12 +44,13 @@ def parse_args():
         default=False,
         help='verbose'
     )
+    add_feature_arguments(parser)
     parser.add_argument(
-        '-p',
-        '--with-pos',
-        action='store_true',
-        default=False,
-        help='use POS tags as feature'
+        '-j',
+        '--jobs',
+        type=int,
+        default=1,
+        help='number of folds trained and tested at the same time',
     )
     parser.add_argument(
         '-k',
@@ -114,16 +117,15 @@ def update_results(results: dict) -> None:
 
 
 args = parse_args()
-iob = IOB()
-feats = CRFFeatures(with_pos=args.with_pos)
+iob = IOB(cache=True)
+feats = features_from_args(args)
 
-sentences = iob.parse_file(args.dataset)
-sentences = [
-        [(token[0], token[1]) for token in sent]
-        for sent in iob.parse_file(args.dataset)
-    ]
+sentences = Corpus(
+    [(token[0], token[1]) for token in sent]
+    for sent in iob.iter_file(args.dataset)
+)
 
-X = [feats.sent2features(s) for s in sentences]
+X = feats.sents2features(sentences)
 y = [feats.sent2labels(s) for s in sentences]
 
 ITER = 0
@@ -132,11 +134,20 @@ full_results = defaultdict(lambda: defaultdict(list))
 if shuffle is False:
     random_state = None
 
-for train, test in KFold(
+folds = list(KFold(
     n_splits=args.kfolds,
     shuffle=shuffle,
     random_state=random_state
-).split(X):
+).split(X))
+
+
+def run_fold(n: int) -> dict:
+    """
+    Trains and tests the n-th fold, returning its classification report.
+    When run in a forked worker, X and y are inherited from the parent
+    process instead of being sent to it.
+    """
+    train, test = folds[n]
     crf = sklearn_crfsuite.CRF(
         algorithm='lbfgs',
         c1=c1,
@@ -154,12 +165,24 @@ for train, test in KFold(
     crf.fit(X_train, y_train)
     y_pred = crf.predict(X_test)
 
-    iter_results = seq_classification_report(
+    return seq_classification_report(
         y_test,
         y_pred,
         digits=3,
         output_dict=True)
 
+
+if args.jobs > 1 and "fork" in mp.get_all_start_methods():
+    with ProcessPoolExecutor(
+            max_workers=min(args.jobs, len(folds)),
+            mp_context=mp.get_context("fork")) as executor:
+        fold_results = executor.map(run_fold, range(len(folds)))
+        # results are collected in fold order, as in a sequential run
+        fold_results = list(fold_results)
+else:
+    fold_results = map(run_fold, range(len(folds)))
+
+for (train, test), iter_results in zip(folds, fold_results):
     if args.verbose:
         pp = PrettyPrinter(stream=sys.stderr)
         print("==================", file=sys.stderr)
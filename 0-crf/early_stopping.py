@@ -0,0 +1,145 @@
+"""
+Early stopping for CRF training.
+
+crfsuite evaluates the model on the holdout (dev) set after every L-BFGS
+iteration. EarlyStoppingTrainer looks at that evaluation every `every`
+iterations and stops training, by raising StopTraining from the crfsuite
+callback, when the entity F1 has not improved for `patience` evaluations.
+
+crfsuite does not write intermediate models, but L-BFGS is deterministic:
+training again for the number of iterations of the best evaluation gives
+exactly the model of that checkpoint, which is what fit_early_stopping()
+returns. Training is only stopped when that costs fewer iterations than
+running to max_iterations: otherwise it goes on, and the final model is
+kept.
+"""
+from functools import partial
+from telemetry import TelemetryTrainer
+
+
+class StopTraining(Exception):
+    """
+    Raised from the crfsuite callback to stop training, with the log of
+    the iterations run
+    """
+    def __init__(self, iterations: list):
+        super().__init__("entity F1 on the dev set stopped improving")
+        self.iterations = iterations
+
+
+def entity_f1(scores: dict) -> float:
+    """
+    Returns the micro-averaged F1 of the entity labels (every label but O)
+    from the holdout scores of a crfsuite iteration. crfsuite scores
+    tokens, so this is the token-level F1 of the entity tags.
+    """
+    match = model = ref = 0
+    for label, score in scores.items():
+        if label != 'O':
+            match += score.match
+            model += score.model
+            ref += score.ref
+    if not match:
+        return 0.0
+    return 2 * match / (model + ref)
+
+
+def best_checkpoint(iterations: list, every: int, patience: int) -> tuple:
+    """
+    Returns the (iteration, score) of the best evaluation in a list of
+    crfsuite iterations, and whether the score has stopped improving
+    """
+    best = (0, -1.0)
+    for info in iterations:
+        if info['num'] % every or 'scores' not in info:
+            continue
+        score = entity_f1(info['scores'])
+        if score > best[1]:
+            best = (info['num'], score)
+        elif info['num'] - best[0] >= every * patience:
+            return best, True
+    return best, False
+
+
+class EarlyStoppingTrainer(TelemetryTrainer):
+    """
+    Trainer that stops when the entity F1 on the holdout set has not
+    improved for `patience` evaluations, done every `every` iterations
+    """
+    def __init__(
+            self,
+            algorithm=None,
+            params=None,
+            verbose=True,
+            telemetry=None,
+            phase=None,
+            every=5,
+            patience=3,
+            max_iterations=None):
+        super().__init__(
+            algorithm=algorithm, params=params, verbose=verbose,
+            telemetry=telemetry, phase=phase)
+        self.every = every
+        self.patience = patience
+        self.max_iterations = max_iterations
+
+    def on_iteration(self, log, info):
+        super().on_iteration(log, info)
+        if info['num'] % self.every == 0:
+            (best, _), stop = best_checkpoint(
+                self.logparser.iterations, self.every, self.patience)
+            # training again up to the best checkpoint must cost less
+            # than going on to the last iteration
+            if stop and (self.max_iterations is None
+                         or info['num'] + best <= self.max_iterations):
+                raise StopTraining(self.logparser.iterations)
+
+
+def fit_early_stopping(
+        crf,
+        X_train,
+        y_train,
+        X_dev,
+        y_dev,
+        every: int = 5,
+        patience: int = 3,
+        telemetry=None):
+    """
+    Trains a sklearn_crfsuite.CRF with early stopping on the dev set and
+    returns it with the iteration and the dev entity F1 of the best
+    checkpoint, the number of iterations run and the iteration of the
+    model returned: the best checkpoint when training stopped early, the
+    last iteration otherwise. The iterations are written to telemetry, if
+    given, with the phase "early_stopping" and, for the training again up
+    to the best checkpoint, "checkpoint".
+    """
+    trainer_cls = crf.trainer_cls
+    max_iterations = crf.max_iterations
+    crf.set_params(trainer_cls=partial(
+        EarlyStoppingTrainer, telemetry=telemetry, phase="early_stopping",
+        every=every, patience=patience, max_iterations=max_iterations))
+    stopped = False
+    try:
+        crf.fit(X_train, y_train, X_dev, y_dev)
+        iterations = crf.training_log_.iterations
+    except StopTraining as stop:
+        # no model is written when training is interrupted
+        stopped = True
+        iterations = stop.iterations
+    finally:
+        crf.set_params(trainer_cls=trainer_cls)
+
+    (best, score), _ = best_checkpoint(iterations, every, patience)
+    run = iterations[-1]['num'] if iterations else 0
+    if not stopped:
+        return crf, best, score, run, run
+
+    crf.set_params(
+        max_iterations=best,
+        trainer_cls=partial(
+            TelemetryTrainer, telemetry=telemetry, phase="checkpoint"))
+    try:
+        crf.fit(X_train, y_train)
+    finally:
+        crf.set_params(max_iterations=max_iterations, trainer_cls=trainer_cls)
+    return crf, best, score, run, best
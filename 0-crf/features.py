@@ -1,3 +1,11 @@
+import multiprocessing as mp
+import os
+import sys
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from templates import FeatureExtractor, default_templates, load_templates
+
 pos_map = {
     'ADJ': 'A',
     'ADP': 'S',
@@ -18,10 +26,150 @@ pos_map = {
     'X': 'X',
 }
 
+# state of the featurization workers, set when they are forked
+_worker_feats = None
+_worker_sentences = None
+
+MemoInfo = namedtuple('MemoInfo', 'hits misses maxsize currsize')
+
+
+def _init_worker(feats, sentences):
+    global _worker_feats, _worker_sentences
+    _worker_feats = feats
+    _worker_sentences = sentences
+
+
+def _worker_attributes(sentences):
+    attributes = [_worker_feats._attributes(s) for s in sentences]
+    memo = MemoInfo(*_worker_feats._word_attributes.cache_info())
+    return attributes, os.getpid(), memo
+
+
+def _attributes_range(bounds):
+    start, end = bounds
+    return _worker_attributes(
+        _worker_sentences[i] for i in range(start, end))
+
+
+def _attributes_list(sentences):
+    return _worker_attributes(sentences)
+
+
+class FeaturePool:
+    """
+    Processes that compute the word attributes of sentences for a
+    CRFFeatures, to pass to its sents2features() calls. The workers are
+    forked once and keep their memo of word attributes for all the calls,
+    and only the sentences of each call are sent to them. A pool for the
+    sentences of a single call lets the workers inherit them instead. With
+    workers <= 1 (or without fork), the attributes are computed here.
+    """
+    def __init__(self, feats, workers: int, sentences=None):
+        self.feats = feats
+        self.workers = workers
+        self._sentences = sentences
+        self._executor = None
+        if workers > 1 and "fork" in mp.get_all_start_methods():
+            self._executor = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=mp.get_context("fork"),
+                initializer=_init_worker,
+                initargs=(feats, sentences))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def attributes(self, sentences) -> list:
+        """Returns the attributes of every sentence, in order"""
+        if self._executor is None:
+            return [self.feats._attributes(s) for s in sentences]
+
+        n_sents = len(sentences)
+        # a few ranges per worker, to even out the load
+        step = max(1, -(-n_sents // (self.workers * 4)))
+        ranges = [
+            (start, min(start + step, n_sents))
+            for start in range(0, n_sents, step)
+        ]
+        if sentences is self._sentences:
+            results = self._executor.map(_attributes_range, ranges)
+        else:
+            results = self._executor.map(_attributes_list, [
+                [list(sentences[i]) for i in range(start, end)]
+                for start, end in ranges])
+
+        attributes = []
+        for chunk, pid, memo in results:
+            attributes += chunk
+            self.feats._worker_memo[pid] = memo
+        return attributes
+
 
 class CRFFeatures:
-    def __init__(self, with_pos=False):
+    def __init__(
+            self,
+            with_pos=False,
+            memo_size=1 << 16,
+            templates=None,
+            hash_bits=None):
+        """
+        Features are defined by a list of templates (see templates.py),
+        by default the ones of word2features(), with or without PoS tags.
+        With hash_bits, string features are hashed into 2**hash_bits
+        buckets. The attributes of the last memo_size distinct words are
+        memoized (None means no bound, 0 disables the memo).
+        """
         self.with_pos = with_pos
+        self._memo_size = memo_size
+        if templates is None:
+            templates = default_templates(with_pos)
+        self._extractor = FeatureExtractor(templates, hash_bits)
+        self._word_attributes = lru_cache(maxsize=memo_size)(
+            self._extractor.word_attributes)
+        # the last memo info of each feature worker
+        self._worker_memo = {}
+        self._pos_hashes = {
+            tag: self._extractor.hash_value(tag)
+            for tag in set(pos_map.values()) | {'X'}
+        }
+
+    def __getstate__(self):
+        # compiled functions cannot be pickled, they are compiled again
+        return {
+            'with_pos': self.with_pos,
+            'memo_size': self._memo_size,
+            'templates': self.templates,
+            'hash_bits': self._extractor.hash_bits,
+        }
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+    @property
+    def templates(self):
+        return self._extractor.templates
+
+    def memo_info(self):
+        """
+        Returns the hits, misses, maximum and current size of the word
+        attribute memo, added up over this process and the feature workers
+        """
+        infos = [self._word_attributes.cache_info(),
+                 *self._worker_memo.values()]
+        return MemoInfo(
+            hits=sum(info.hits for info in infos),
+            misses=sum(info.misses for info in infos),
+            maxsize=self._memo_size,
+            currsize=sum(info.currsize for info in infos),
+        )
 
     def word2features(self, sent, i):
         word = sent[i][0]
@@ -72,7 +220,98 @@ class CRFFeatures:
         return features
 
     def sent2features(self, sent):
-        return [self.word2features(sent, i) for i in range(len(sent))]
+        """
+        Returns the features of every token of a sentence. With the default
+        templates, the output is the same as calling word2features() for
+        every token, but the attributes of each word are computed only once
+        and then shared by the features of the word and of its neighbours.
+        """
+        return self._assemble(self._attributes(sent))
+
+    def sents2features(self, sentences, workers=1, pool=None):
+        """
+        Returns sent2features() for every sentence, in order. With
+        workers > 1, the word attributes are computed by that number of
+        forked processes, or by the workers of a FeaturePool, which only
+        send back the attribute columns of each sentence; the feature
+        dicts are then built from them here, so they never go through
+        pickling.
+        """
+        if pool is not None:
+            return [self._assemble(a) for a in pool.attributes(sentences)]
+        if workers <= 1 or "fork" not in mp.get_all_start_methods():
+            return [self.sent2features(s) for s in sentences]
+
+        if not hasattr(sentences, '__getitem__'):
+            sentences = list(sentences)
+        # forked workers inherit the sentences, only ranges are sent to them
+        with FeaturePool(self, workers, sentences) as pool:
+            return [self._assemble(a) for a in pool.attributes(sentences)]
+
+    def _attributes(self, sent):
+        """
+        Returns the number of tokens of a sentence, the columns of the
+        attributes of its words and its PoS tags
+        """
+        tokens = list(sent)
+        words = [token[0] for token in tokens]
+
+        postags = None
+        if self._extractor.uses_pos:
+            if any(len(token) < 2 for token in tokens):
+                raise Exception(
+                    "With PoS option, the dataset must have two fields.")
+            postags = [pos_map.get(token[1], 'X') for token in tokens]
+            if self._extractor.hash_bits is not None:
+                postags = [self._pos_hashes[tag] for tag in postags]
+
+        columns = tuple(zip(*map(self._word_attributes, words))) \
+            or ((),) * self._extractor.n_attributes
+        return len(words), columns, postags
+
+    def _assemble(self, attributes):
+        return self._extractor.assemble(*attributes)
 
     def sent2labels(self, sent):
         return [token[-1] for token in sent]
+
+
+def add_feature_arguments(parser):
+    """Adds the options of the features to an argparse parser"""
+    parser.add_argument(
+        '-p',
+        '--with-pos',
+        action='store_true',
+        default=False,
+        help='use POS tags as feature'
+    )
+    parser.add_argument(
+        '--templates',
+        type=str,
+        metavar='FILE',
+        help='file with the feature templates, one per line; without it, '
+             'the built-in features are used (see templates.py)',
+    )
+    parser.add_argument(
+        '--hash-bits',
+        type=int,
+        metavar='N',
+        help='hash string features into 2**N buckets, to bound the size of '
+             'the model; without it, features are not hashed',
+    )
+
+
+def features_from_args(args):
+    """
+    Returns the CRFFeatures of the options added by add_feature_arguments().
+    Exits with an error message if they are not valid.
+    """
+    try:
+        return CRFFeatures(
+            with_pos=args.with_pos,
+            templates=load_templates(args.templates),
+            hash_bits=args.hash_bits,
+        )
+    except ValueError as err:
+        print(f"Error: {err}", file=sys.stderr)
+        sys.exit(1)
@@ -0,0 +1,278 @@
+"""
+Linear-chain CRF computations with NumPy, on the same model as crfsuite.
+
+Feature dicts are turned into attributes as pycrfsuite does: a string
+value gives the attribute 'name:value' with value 1.0, any other value
+(bool, int, float) the attribute 'name' with that value. The score of a
+label sequence is the sum of the state weights of the attributes of each
+token for its label plus the transition weights between consecutive
+labels, with no start or end transitions, as in crfsuite.
+
+Sentences are encoded once into a sparse matrix with one row per token
+(Corpus), and processed in batches of sentences of similar length, with
+the recursions over positions vectorised over sentences and labels.
+"""
+import numpy as np
+import scipy.sparse as sp
+
+
+class Vocabulary:
+    """
+    Ids of a list of strings. With grow, unknown strings get new ids,
+    otherwise they are ignored (id -1).
+    """
+    def __init__(self, strings=()):
+        self.strings = list(strings)
+        self.ids = {s: i for i, s in enumerate(self.strings)}
+
+    def __len__(self):
+        return len(self.strings)
+
+    def get(self, string: str, grow: bool = False) -> int:
+        i = self.ids.get(string, -1)
+        if i < 0 and grow:
+            i = self.ids[string] = len(self.strings)
+            self.strings.append(string)
+        return i
+
+
+class Corpus:
+    """
+    Sentences encoded for the CRF: the attributes of every token (a CSR
+    matrix, tokens x attributes), the first token of each sentence and,
+    for training data, the label id of every token
+    """
+    def __init__(self, X, attributes: Vocabulary, y=None, labels=None,
+                 grow: bool = False):
+        indptr = [0]
+        indices = []
+        values = []
+        starts = [0]
+        ids = attributes.ids
+        # attributes as in pycrfsuite (see above), in a loop that runs
+        # once per feature of the corpus
+        for xseq in X:
+            for features in xseq:
+                for key, value in features.items():
+                    if isinstance(value, str):
+                        key = f"{key}:{value}"
+                        value = 1.0
+                    a = ids.get(key)
+                    if a is None:
+                        if not grow:
+                            continue
+                        a = attributes.get(key, grow=True)
+                    indices.append(a)
+                    values.append(value)
+                indptr.append(len(indices))
+            starts.append(len(indptr) - 1)
+        self.n_attributes = len(attributes)
+        self.tokens = sp.csr_matrix(
+            (np.array(values, dtype=np.float64),
+             np.array(indices, dtype=np.int64),
+             np.array(indptr, dtype=np.int64)),
+            shape=(len(indptr) - 1, len(attributes)))
+        self.starts = np.array(starts, dtype=np.int64)
+        self.lengths = np.diff(self.starts)
+        self.labels = None
+        if y is not None:
+            self.labels = np.array(
+                [labels.get(label, grow) for yseq in y for label in yseq],
+                dtype=np.int64)
+
+    def __len__(self):
+        return len(self.lengths)
+
+    def batches(self, size: int = 512):
+        """
+        Yields (sentence ids, padded token positions) for batches of
+        sentences sorted by length. Positions past the end of a sentence
+        are -1.
+        """
+        return batches(self.starts, self.lengths, size)
+
+    def positions(self, ids: np.ndarray) -> np.ndarray:
+        """
+        Returns the padded token positions of the given sentences, a
+        (sentences, steps) array with -1 past the end of each sentence
+        """
+        return positions(self.starts, self.lengths, ids)
+
+
+def batches(starts: np.ndarray, lengths: np.ndarray, size: int = 512):
+    """Corpus.batches() of sentences given by their starts and lengths"""
+    order = np.argsort(lengths, kind="stable")
+    order = order[lengths[order] > 0]
+    for i in range(0, len(order), size):
+        ids = order[i:i + size]
+        yield ids, positions(starts, lengths, ids)
+
+
+def positions(starts: np.ndarray, lengths: np.ndarray,
+              ids: np.ndarray) -> np.ndarray:
+    """Corpus.positions() of sentences given by their starts and lengths"""
+    lengths = lengths[ids]
+    steps = np.arange(lengths.max(initial=0))
+    padded = starts[ids][:, None] + steps[None, :]
+    padded[steps[None, :] >= lengths[:, None]] = -1
+    return padded
+
+
+def _padded(values: np.ndarray, positions: np.ndarray, fill=0.0):
+    """Gathers per-token rows into a (sentences, steps, ...) array"""
+    out = values[np.maximum(positions, 0)]
+    out[positions < 0] = fill
+    return out
+
+
+def forward_backward(emissions: np.ndarray, transitions: np.ndarray,
+                     mask: np.ndarray):
+    """
+    Scaled forward-backward of a batch, in probability space as crfsuite
+    does: emissions is (B, T, L), mask (B, T) marks the real tokens.
+    Returns the normalised alpha and beta, the exponentiated emissions
+    over the scale of each position and log Z. alpha * beta are the label
+    marginals of each token, and alpha[t - 1, i] * exp(transitions[i, j])
+    * scaled[t, j] those of each pair of labels.
+    """
+    B, T, L = emissions.shape
+    # scores are shifted by their maximum before exp(), and added to log Z
+    top = emissions.max(axis=2)
+    exp_emissions = np.exp(emissions - top[..., None])
+    shift = transitions.max()
+    exp_transitions = np.exp(transitions - shift)
+
+    alpha = np.empty((B, T, L))
+    scale = np.ones((B, T))
+    scale[:, 0] = exp_emissions[:, 0].sum(axis=1)
+    alpha[:, 0] = exp_emissions[:, 0] / scale[:, 0, None]
+    for t in range(1, T):
+        step = (alpha[:, t - 1] @ exp_transitions) * exp_emissions[:, t]
+        scale[:, t] = np.where(mask[:, t], step.sum(axis=1), 1.0)
+        # the padding repeats the last real position
+        alpha[:, t] = np.where(
+            mask[:, t, None], step / scale[:, t, None], alpha[:, t - 1])
+    scaled = exp_emissions / scale[..., None]
+
+    beta = np.ones((B, T, L))
+    for t in range(T - 1, 0, -1):
+        step = (scaled[:, t] * beta[:, t]) @ exp_transitions.T
+        beta[:, t - 1] = np.where(mask[:, t, None], step, 1.0)
+
+    log_z = (np.log(scale) + np.where(mask, top, 0.0)).sum(axis=1) \
+        + shift * (mask.sum(axis=1) - 1)
+    return alpha, beta, scaled, log_z
+
+
+def viterbi(emissions: np.ndarray, transitions: np.ndarray,
+            mask: np.ndarray) -> np.ndarray:
+    """
+    Best label sequences of a batch: emissions is (B, T, L), mask (B, T)
+    marks the real tokens. Returns the (B, T) label ids; the ones past the
+    end of a sentence repeat its last label. Scores are added in the same
+    order as crfsuite, and ties go to the lowest label id as in crfsuite.
+    """
+    B, T, L = emissions.shape
+    score = emissions[:, 0].copy()
+    back = np.empty((B, T, L), dtype=np.int64)
+    back[:, 0] = np.arange(L)
+    for t in range(1, T):
+        candidates = score[:, :, None] + transitions[None]
+        best = candidates.argmax(axis=1)
+        step = candidates.max(axis=1) + emissions[:, t]
+        # the padding keeps the score and points to the same label
+        score = np.where(mask[:, t, None], step, score)
+        back[:, t] = np.where(mask[:, t, None], best, np.arange(L))
+
+    path = np.empty((B, T), dtype=np.int64)
+    path[:, -1] = score.argmax(axis=1)
+    rows = np.arange(B)
+    for t in range(T - 1, 0, -1):
+        path[:, t - 1] = back[rows, t, path[:, t]]
+    return path
+
+
+def decode(emissions: np.ndarray, starts: np.ndarray, lengths: np.ndarray,
+           transitions: np.ndarray, batch_size: int = 512) -> list:
+    """
+    Returns the best label ids of every sentence, from the state scores
+    of all their tokens (tokens x labels)
+    """
+    paths = [np.zeros(0, dtype=np.int64)] * len(lengths)
+    for ids, batch in batches(starts, lengths, batch_size):
+        best = viterbi(_padded(emissions, batch), transitions, batch >= 0)
+        for i, path in zip(ids, best):
+            paths[i] = path[:lengths[i]]
+    return paths
+
+
+def log_likelihood(corpus: Corpus, state: np.ndarray,
+                   transitions: np.ndarray, batch_size: int = 512):
+    """
+    Returns the log-likelihood of the labels of a corpus and its gradient
+    with respect to the state weights (attributes x labels) and the
+    transition weights (labels x labels)
+    """
+    emissions_all = corpus.tokens @ state
+    grad_emissions = np.zeros_like(emissions_all)
+    expected = np.zeros_like(transitions)
+    total = 0.0
+
+    for _, positions in corpus.batches(batch_size):
+        mask = positions >= 0
+        emissions = _padded(emissions_all, positions)
+        gold = _padded(corpus.labels, positions, 0)
+        alpha, beta, scaled, log_z = forward_backward(
+            emissions, transitions, mask)
+
+        # score of the gold sequences
+        rows = np.arange(len(positions))[:, None]
+        steps = np.arange(positions.shape[1])[None, :]
+        score = np.where(mask, emissions[rows, steps, gold], 0.0).sum(1)
+        pairs = mask[:, 1:]
+        score += np.where(
+            pairs, transitions[gold[:, :-1], gold[:, 1:]], 0.0).sum(1)
+        total += float((score - log_z).sum())
+
+        # expected counts
+        grad_emissions[positions[mask]] = (alpha * beta)[mask]
+        if positions.shape[1] > 1:
+            expected += np.einsum(
+                "bti,btj->ij", alpha[:, :-1] * pairs[..., None],
+                scaled[:, 1:] * beta[:, 1:])
+
+    # minus observed counts
+    grad_emissions[np.arange(len(corpus.labels)), corpus.labels] -= 1.0
+    expected *= np.exp(transitions - transitions.max())
+    inner = np.ones(len(corpus.labels), dtype=bool)
+    inner[corpus.starts[:-1][corpus.lengths > 0]] = False
+    prev = np.flatnonzero(inner) - 1
+    n_labels = len(transitions)
+    expected -= np.bincount(
+        corpus.labels[prev] * n_labels + corpus.labels[prev + 1],
+        minlength=n_labels * n_labels).reshape(n_labels, n_labels)
+
+    grad_state = corpus.tokens.T @ grad_emissions
+    # the gradients above are of the negative log-likelihood
+    return total, -grad_state, -expected
+
+
+def observed_features(corpus: Corpus, n_labels: int):
+    """
+    Returns the (attribute, label) and (label, label) pairs that occur in
+    the training data, which are the features crfsuite generates
+    """
+    state = sp.csr_matrix(
+        (np.ones(len(corpus.labels)),
+         (np.arange(len(corpus.labels)), corpus.labels)),
+        shape=(corpus.tokens.shape[0], n_labels))
+    # attributes with value 0 are features too
+    pattern = corpus.tokens.copy()
+    pattern.data[:] = 1.0
+    state = (pattern.T @ state).toarray() != 0
+    transitions = np.zeros((n_labels, n_labels), dtype=bool)
+    inner = np.ones(len(corpus.labels), dtype=bool)
+    inner[corpus.starts[:-1][corpus.lengths > 0]] = False
+    prev = np.flatnonzero(inner) - 1
+    transitions[corpus.labels[prev], corpus.labels[prev + 1]] = True
+    return state, transitions
@@ -1,17 +1,28 @@
 import argparse
+import atexit
+import os
 import pickle
+import tempfile
 from itertools import chain
 from scipy import stats
-from sklearn.model_selection import train_test_split, RandomizedSearchCV
+from sklearn.experimental import enable_halving_search_cv  # noqa: F401
+from sklearn.model_selection import (
+    train_test_split, RandomizedSearchCV, HalvingRandomSearchCV
+)
 from sklearn_crfsuite import metrics, CRF
 from sklearn.metrics import make_scorer
 from IOB import IOB
-from features import CRFFeatures
+from features import add_feature_arguments, features_from_args
+from shared_features import (
+    SharedFeatures, remove_shared_features, write_shared_features
+)
 from config import version, test_size, random_state, shuffle
 
 
 def parse_args():
-    description = "Use RandomizedSearchCV to optimize hyperparameters."
+    description = (
+        "Use RandomizedSearchCV (or HalvingRandomSearchCV) to optimize "
+        "hyperparameters.")
 
     parser = argparse.ArgumentParser(
         description=description,
@@ -31,12 +42,15 @@ def parse_args():
         help='verbose'
     )
     parser.add_argument(
-        '-p',
-        '--with-pos',
-        action='store_true',
-        default=False,
-        help='use POS tags as feature'
+        '-s',
+        '--search',
+        choices=['random', 'halving'],
+        default='random',
+        help='search strategy: random evaluates every candidate on the '
+             'whole training set, halving evaluates them on growing subsets '
+             'and only keeps the best third at each step',
     )
+    add_feature_arguments(parser)
     parser.add_argument(
         'dataset',
         metavar='input file',
@@ -51,7 +65,7 @@ def flatten(y):
 
 
 args = parse_args()
-iob = IOB()
+iob = IOB(cache=True, compact=True)
 
 crf = CRF(
     algorithm='lbfgs',
@@ -59,17 +73,23 @@ crf = CRF(
     all_possible_transitions=True,
     verbose=args.verbose,
 )
-feats = CRFFeatures(with_pos=args.with_pos)
+feats = features_from_args(args)
 
-sentences = iob.parse_file(args.dataset)
-train, test = train_test_split(
-    sentences,
+train_ids, test_ids = train_test_split(
+    range(iob.count_sentences(args.dataset)),
     test_size=test_size,
     random_state=random_state,
     shuffle=shuffle
 )
-
-X_train = [feats.sent2features(s) for s in train]
+train = iob.parse_sentences(args.dataset, train_ids)
+
+# features are encoded once into a file that search workers memory-map,
+# so X_train is not copied to every worker for every candidate
+fd, shared_file = tempfile.mkstemp(suffix='.features')
+os.close(fd)
+atexit.register(remove_shared_features, shared_file)
+write_shared_features(shared_file, feats, train)
+X_train = SharedFeatures(shared_file, feats)
 y_train = [feats.sent2labels(s) for s in train]
 
 sorted_labels = sorted(
@@ -85,14 +105,30 @@ f1_scorer = make_scorer(
     average='weighted',
     labels=sorted_labels)
 
-rs = RandomizedSearchCV(estimator=crf,
-                        param_distributions=param_grid,
-                        scoring=f1_scorer,
-                        cv=3,
-                        verbose=True,
-                        n_iter=100,
-                        random_state=random_state,
-                        n_jobs=-1)
+if args.search == 'halving':
+    # successive halving: the 100 candidates are first trained on a small
+    # subset of the sentences, and only the best third of them go on to a
+    # subset three times larger, until the last ones use the whole set
+    rs = HalvingRandomSearchCV(estimator=crf,
+                               param_distributions=param_grid,
+                               scoring=f1_scorer,
+                               cv=3,
+                               verbose=True,
+                               n_candidates=100,
+                               factor=3,
+                               resource='n_samples',
+                               min_resources='exhaust',
+                               random_state=random_state,
+                               n_jobs=-1)
+else:
+    rs = RandomizedSearchCV(estimator=crf,
+                            param_distributions=param_grid,
+                            scoring=f1_scorer,
+                            cv=3,
+                            verbose=True,
+                            n_iter=100,
+                            random_state=random_state,
+                            n_jobs=-1)
 
 rs.fit(X_train, y_train)
 
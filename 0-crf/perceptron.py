@@ -0,0 +1,141 @@
+"""
+Structured averaged perceptron with NumPy, as a fast alternative to the
+L-BFGS training of crfsuite.
+
+The feature dicts of CRFFeatures are encoded once into a sparse matrix
+through a dictionary of attributes (npcrf.Corpus), so memory is linear in
+the number of non-zero features. Each epoch goes over the sentences in
+random order, in mini-batches: every batch is decoded with the current
+weights by a Viterbi vectorised over its sentences, and the weights move
+towards the gold labels and away from the predicted ones. The model kept
+is the average of the weights after every batch, which generalises much
+better than the last weights.
+
+The model is the one of crfsuite (state and transition weights, with no
+start or end transitions), so it tags in the same way.
+"""
+import time
+import numpy as np
+from sklearn_crfsuite.metrics import flat_accuracy_score
+from npcrf import Corpus, Vocabulary, decode, viterbi, _padded
+
+
+class AveragedPerceptron:
+    """
+    Sequence labeller trained with a structured averaged perceptron, with
+    the fit(), predict() and score() methods of sklearn_crfsuite.CRF
+    """
+    def __init__(
+            self,
+            epochs: int = 10,
+            batch_size: int = 32,
+            random_state: int = 0,
+            verbose: bool = False):
+        self.epochs = epochs
+        self.batch_size = batch_size
+        self.random_state = random_state
+        self.verbose = verbose
+
+    def fit(self, X, y, telemetry=None):
+        """
+        Trains on the feature dicts X and the labels y. Every epoch is
+        written to telemetry, if given.
+        """
+        attributes = Vocabulary()
+        labels = Vocabulary()
+        corpus = Corpus(X, attributes, y, labels, grow=True)
+        n_labels = len(labels)
+        state = np.zeros((len(attributes), n_labels))
+        transitions = np.zeros((n_labels, n_labels))
+        # sums of the updates weighted by the step they were made at, to
+        # get the average of the weights at the end (Daume's trick)
+        state_steps = np.zeros_like(state)
+        transitions_steps = np.zeros_like(transitions)
+        step = 1
+        rng = np.random.default_rng(self.random_state)
+        sentences = np.flatnonzero(corpus.lengths)
+        identity = np.eye(n_labels)
+
+        for epoch in range(1, self.epochs + 1):
+            start = time.perf_counter()
+            errors = 0
+            order = rng.permutation(sentences)
+            for i in range(0, len(order), self.batch_size):
+                positions = corpus.positions(order[i:i + self.batch_size])
+                mask = positions >= 0
+                tokens = corpus.tokens[positions[mask]]
+                emissions = np.zeros(mask.shape + (n_labels,))
+                emissions[mask] = tokens @ state
+                predicted = viterbi(emissions, transitions, mask)
+                gold = _padded(corpus.labels, positions, 0)
+
+                wrong = mask & (predicted != gold)
+                if wrong.any():
+                    errors += int(wrong.sum())
+                    delta = identity[gold[mask]] - identity[predicted[mask]]
+                    delta_state = tokens.T @ delta
+                    pairs = mask[:, 1:]
+                    delta_transitions = (
+                        np.bincount(
+                            gold[:, :-1][pairs] * n_labels
+                            + gold[:, 1:][pairs],
+                            minlength=n_labels * n_labels)
+                        - np.bincount(
+                            predicted[:, :-1][pairs] * n_labels
+                            + predicted[:, 1:][pairs],
+                            minlength=n_labels * n_labels)
+                    ).reshape(n_labels, n_labels)
+                    state += delta_state
+                    transitions += delta_transitions
+                    state_steps += step * delta_state
+                    transitions_steps += step * delta_transitions
+                step += 1
+
+            seconds = time.perf_counter() - start
+            if self.verbose:
+                print("Epoch {:<3} time={:<5.2f} errors={}".format(
+                    epoch, seconds, errors))
+            if telemetry is not None:
+                telemetry.write(
+                    "iteration",
+                    num=epoch,
+                    errors=errors,
+                    active_features=int(
+                        np.count_nonzero(state)
+                        + np.count_nonzero(transitions)),
+                    seconds=seconds,
+                )
+
+        self.classes_ = labels.strings
+        self.attributes_ = attributes.strings
+        self._attribute_ids = attributes
+        self.state_ = state - state_steps / step
+        self.transitions_ = transitions - transitions_steps / step
+        return self
+
+    def __getstate__(self):
+        # the dictionary of attributes is built again when it is needed
+        state = dict(self.__dict__)
+        state.pop('_attribute_ids', None)
+        return state
+
+    def _attributes(self) -> Vocabulary:
+        """Returns the ids of the attributes, built on the first call"""
+        if getattr(self, '_attribute_ids', None) is None:
+            self._attribute_ids = Vocabulary(self.attributes_)
+        return self._attribute_ids
+
+    def predict(self, X) -> list:
+        """Returns the best label sequence of each sentence of X"""
+        corpus = Corpus(X, self._attributes())
+        paths = decode(
+            corpus.tokens @ self.state_, corpus.starts, corpus.lengths,
+            self.transitions_)
+        return [[self.classes_[k] for k in path] for path in paths]
+
+    def predict_single(self, xseq) -> list:
+        return self.predict([xseq])[0]
+
+    def score(self, X, y) -> float:
+        """Returns the accuracy of the labels predicted for X"""
+        return flat_accuracy_score(y, self.predict(X))
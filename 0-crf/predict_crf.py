@@ -1,9 +1,13 @@
 import argparse
-import pickle
 import sys
-from features import CRFFeatures
+from itertools import islice
+from features import (
+    FeaturePool, add_feature_arguments, features_from_args
+)
+from crfsuite_model import load_crf
+from batch_tagger import BatchTagger
 from config import version
-from IOB import IOB
+from IOB import IOB, IOBWriter, open_text
 
 
 def parse_args():
@@ -33,20 +37,14 @@ def parse_args():
         action='version',
         version=f'%(prog)s {version}'
     )
-    parser.add_argument(
-        '-p',
-        '--with-pos',
-        action='store_true',
-        default=False,
-        help='use POS tags as feature',
-    )
+    add_feature_arguments(parser)
     parser.add_argument(
         '-m',
         '--model',
         default='crf.model',
         type=str,
         metavar='FILE',
-        help='model file',
+        help='model file (pickle or crfsuite format)',
     )
     parser.add_argument(
         '-s',
@@ -56,6 +54,36 @@ def parse_args():
         metavar='FILE',
         help='spacy model for the tokenizer'
     )
+    parser.add_argument(
+        '-c',
+        '--chunk-size',
+        default=1000,
+        type=int,
+        metavar='N',
+        help='number of sentences tagged and written at a time',
+    )
+    parser.add_argument(
+        '-w',
+        '--workers',
+        type=int,
+        default=1,
+        help='number of processes used to compute the features',
+    )
+    parser.add_argument(
+        '--tagger',
+        choices=['crfsuite', 'numpy'],
+        default='crfsuite',
+        help='tag each sentence with crfsuite, or whole chunks at once with '
+             'NumPy (same labels, faster on large inputs)',
+    )
+    parser.add_argument(
+        '-o',
+        '--output',
+        type=str,
+        metavar='FILE',
+        help='output file (default: stdout); .gz, .bz2, .xz and .zst '
+             'files are compressed',
+    )
     parser.add_argument(
         'dataset',
         metavar='input file',
@@ -65,17 +93,22 @@ def parse_args():
     return parser.parse_args()
 
 
-args = parse_args()
-iob = IOB()
-crf = pickle.load(open(args.model, 'rb'))
-feats = CRFFeatures(with_pos=args.with_pos)
+def read_paragraphs(ifile):
+    """Yields the paragraphs of a text file, separated by blank lines"""
+    lines = []
+    with open_text(ifile) as fhi:
+        for line in fhi:
+            line = line.strip()
+            if line:
+                lines.append(line)
+            elif lines:
+                yield " ".join(lines)
+                lines = []
+    if lines:
+        yield " ".join(lines)
 
-if args.text:
-    textfile = ""
-    with open(args.dataset) as ifile:
-        for line in ifile:
-            textfile += line.strip()
 
+def read_text(ifile):
     import spacy
     try:
         spacy_model = args.spacy or spacy.util.get_installed_models()[0]
@@ -83,22 +116,65 @@ if args.text:
         print("Unable to load spaCy model", file=sys.stderr)
         sys.exit(1)
 
+    # paragraphs are parsed one batch at a time, so the text is never
+    # held in memory as a whole
     nlp = spacy.load(spacy_model)
-    doc = nlp(textfile)
-    if args.with_pos:
-        sentences = [[(t.text, t.pos_) for t in sent] for sent in doc.sents]
-    else:
-        sentences = [[(t.text,) for t in sent] for sent in doc.sents]
+    for doc in nlp.pipe(read_paragraphs(ifile)):
+        for sent in doc.sents:
+            if args.with_pos:
+                yield [(t.text, t.pos_) for t in sent]
+            else:
+                yield [(t.text,) for t in sent]
+
+
+def read_iob(ifile):
+    for sent in iob.iter_file(ifile):
+        yield [(token[0],) for token in sent]
+
+
+def chunked(sentences, size):
+    """Groups an iterable of sentences into lists of up to size items"""
+    sentences = iter(sentences)
+    while True:
+        chunk = list(islice(sentences, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+args = parse_args()
+if args.chunk_size < 1:
+    print("Error: chunk size must be a positive number", file=sys.stderr)
+    sys.exit(1)
+
+iob = IOB()
+crf = load_crf(args.model)
+feats = features_from_args(args)
+tagger = None
+if args.tagger == 'numpy':
+    try:
+        tagger = BatchTagger.from_model(crf, feats)
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+
+if args.text:
+    sentences = read_text(args.dataset)
 elif args.iob:
-    sentences = [
-        [(token[0],) for token in sent]
-        for sent in iob.parse_file(args.dataset)
-    ]
-
-X = [feats.sent2features(s) for s in sentences]
-y_pred = crf.predict(X)
-
-for i, sentence in enumerate(sentences):
-    for j, token in enumerate(sentence):
-        print("{} {}".format(token[0], y_pred[i][j]))
-    print()
+    sentences = read_iob(args.dataset)
+
+# sentences are read, tagged and written one chunk at a time, so memory
+# does not grow with the size of the input
+# the feature workers are forked once, and keep their memo for all chunks
+with IOBWriter(args.output) as writer, \
+        FeaturePool(feats, args.workers) as pool:
+    for chunk in chunked(sentences, args.chunk_size):
+        if tagger is not None:
+            y_pred = tagger.tag(chunk)
+        else:
+            X = feats.sents2features(chunk, pool=pool)
+            y_pred = crf.predict(X)
+
+        for sentence, tags in zip(chunk, y_pred):
+            writer.write_tagged([token[0] for token in sentence], tags)
+        writer.flush()
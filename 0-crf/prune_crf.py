@@ -0,0 +1,151 @@
+import argparse
+import os
+import pickle
+import sys
+import time
+import numpy as np
+import sklearn_crfsuite
+from sklearn.model_selection import train_test_split
+from seqeval.metrics import f1_score
+from IOB import IOB
+from features import add_feature_arguments, features_from_args
+from crfsuite_model import (
+    is_crfsuite_model, load_crf, model_bytes, read_model, to_crf
+)
+from config import version, test_size, random_state, shuffle
+
+
+def parse_args():
+    description = "Prune the features with small weights of a CRF model " \
+                  "and compare the size, speed and F1 of both models."
+
+    parser = argparse.ArgumentParser(
+        description=description,
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter
+    )
+    parser.add_argument(
+        '-V',
+        '--version',
+        action='version',
+        version=f'%(prog)s {version}'
+    )
+    add_feature_arguments(parser)
+    parser.add_argument(
+        '-t',
+        '--threshold',
+        type=float,
+        default=0.0,
+        metavar='W',
+        help='drop the state and transition features with an absolute '
+             'weight below W',
+    )
+    parser.add_argument(
+        '-k',
+        '--top-k',
+        type=int,
+        metavar='K',
+        help='keep only the K state features with the largest absolute '
+             'weights of each label (default: all)',
+    )
+    parser.add_argument(
+        '-m',
+        '--model',
+        default='crf.model',
+        type=str,
+        metavar='FILE',
+        help='model file (pickle or crfsuite format)'
+    )
+    parser.add_argument(
+        '-o',
+        '--output',
+        default='crf-pruned.model',
+        type=str,
+        metavar='FILE',
+        help='pruned model output file, in the format of the input model',
+    )
+    parser.add_argument(
+        'dataset',
+        metavar='input file',
+        type=str,
+        help='Corpus file, evaluated as in test_crf.py'
+    )
+    return parser.parse_args()
+
+
+def prune(model, threshold: float = 0.0, top_k: int = None):
+    """
+    Sets to zero, in place, the weights of a CRFSuiteModel below the
+    threshold and the state weights beyond the top k of each label
+    """
+    model.state[np.abs(model.state) < threshold] = 0.0
+    model.transitions[np.abs(model.transitions) < threshold] = 0.0
+    if top_k is not None and top_k < model.state.shape[0]:
+        # rows of the attributes with the smallest weights of each label
+        order = np.argsort(-np.abs(model.state), axis=0, kind="stable")
+        drop = order[top_k:]
+        np.put_along_axis(model.state, drop, 0.0, axis=0)
+    return model
+
+
+def evaluate(crf, X, y, repeat: int = 3) -> tuple:
+    """
+    Returns the entity F1 of a model and its tagging speed in sentences
+    per second (best of a few runs)
+    """
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        y_pred = crf.predict(X)
+        best = min(best, time.perf_counter() - start)
+    return f1_score(y, y_pred), len(X) / best
+
+
+args = parse_args()
+if args.threshold < 0 or (args.top_k is not None and args.top_k < 1):
+    print("Error: threshold and top k must be positive numbers",
+          file=sys.stderr)
+    sys.exit(1)
+iob = IOB(cache=True, compact=True)
+feats = features_from_args(args)
+crf = load_crf(args.model)
+if not isinstance(crf, sklearn_crfsuite.CRF):
+    print("Error: pruning needs a model of the crfsuite backend",
+          file=sys.stderr)
+    sys.exit(1)
+
+model = read_model(model_bytes(crf))
+n_features = model.num_features
+n_attributes = int(np.count_nonzero(np.any(model.state != 0, axis=1)))
+model = prune(model, args.threshold, args.top_k)
+if is_crfsuite_model(args.model):
+    model.save(args.output)
+    pruned = load_crf(args.output)
+else:
+    pruned = to_crf(model, crf)
+    with open(args.output, 'wb') as fho:
+        pickle.dump(pruned, fho)
+
+train_ids, test_ids = train_test_split(
+    range(iob.count_sentences(args.dataset)),
+    test_size=test_size,
+    random_state=random_state,
+    shuffle=shuffle
+)
+test = iob.parse_sentences(args.dataset, test_ids)
+X_test = feats.sents2features(test)
+y_test = [feats.sent2labels(s) for s in test]
+
+rows = []
+for name, model_crf, ifile, n_feats, n_attrs in [
+        ("original", crf, args.model, n_features, n_attributes),
+        ("pruned", pruned, args.output, model.num_features,
+         int(np.count_nonzero(np.any(model.state != 0, axis=1))))]:
+    f1, speed = evaluate(model_crf, X_test, y_test)
+    rows.append((name, n_feats, n_attrs, len(model_bytes(model_crf)),
+                 os.path.getsize(ifile), speed, f1))
+
+print("%-10s %10s %10s %12s %12s %12s %8s" % (
+    "model", "features", "attributes", "crfsuite (B)", "file (B)",
+    "sents/s", "F1"))
+for row in rows:
+    print("%-10s %10d %10d %12d %12d %12.0f %8.4f" % row)
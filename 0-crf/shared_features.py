@@ -0,0 +1,89 @@
+"""
+CRF features shared by the processes of a hyperparameter search.
+
+The word attributes of every sentence (see CRFFeatures._attributes()) are
+encoded once into a file, and SharedFeatures is a read-only sequence over
+it. Pickling a SharedFeatures object only sends the name of the file and
+the options of the features, so search workers memory-map the file
+instead of receiving a copy of X for every candidate, and only build the
+feature dicts of the sentences of the fold they are training or testing.
+
+Layout (native byte order)::
+
+    header      number of sentences
+    offsets     n_sents + 1 unsigned 64-bit integers
+    data        one pickle of the attributes of each sentence
+"""
+import mmap
+import os
+import pickle
+import struct
+from array import array
+
+_HEADER = struct.Struct("=Q")
+
+
+def write_shared_features(ofile: str, feats, sentences) -> None:
+    """Encodes the attributes of a list of sentences into a file"""
+    blobs = [
+        pickle.dumps(feats._attributes(s), protocol=pickle.HIGHEST_PROTOCOL)
+        for s in sentences
+    ]
+    offsets = array("Q", [0])
+    for blob in blobs:
+        offsets.append(offsets[-1] + len(blob))
+
+    with open(ofile, "wb") as fho:
+        fho.write(_HEADER.pack(len(blobs)))
+        offsets.tofile(fho)
+        for blob in blobs:
+            fho.write(blob)
+
+
+class SharedFeatures:
+    """
+    Sequence of the features of the sentences of a file written by
+    write_shared_features(): item i is feats.sent2features() of sentence i
+    """
+    def __init__(self, ifile: str, feats):
+        self.ifile = ifile
+        self.feats = feats
+        self._attach()
+
+    def _attach(self) -> None:
+        with open(self.ifile, "rb") as fhi:
+            self._mm = mmap.mmap(fhi.fileno(), 0, access=mmap.ACCESS_READ)
+        n_sents, = _HEADER.unpack_from(self._mm)
+        self._offsets = memoryview(self._mm)[
+            _HEADER.size:_HEADER.size + (n_sents + 1) * 8].cast("Q")
+        self._data = _HEADER.size + (n_sents + 1) * 8
+
+    def __getstate__(self):
+        return {'ifile': self.ifile, 'feats': self.feats}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._attach()
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def __getitem__(self, i: int) -> list:
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError("sentence index out of range")
+        start = self._data + self._offsets[i]
+        end = self._data + self._offsets[i + 1]
+        return self.feats._assemble(pickle.loads(self._mm[start:end]))
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+
+def remove_shared_features(ifile: str) -> None:
+    try:
+        os.remove(ifile)
+    except OSError:
+        pass
@@ -0,0 +1,119 @@
+"""
+Training telemetry as JSON lines.
+
+Each line is an event of a training run: "featurization" (computing the
+features of a set of sentences), "iteration" (one crfsuite iteration:
+loss, gradient norm, active features, seconds) and a final "run" summary
+(featurization and training time, model size). Every event also has the
+seconds elapsed since the start of the run and the peak RSS of the
+process and of its children (the feature workers) so far, in bytes, so
+that time and memory can be plotted against each other.
+
+Lines are flushed as they are written, so the file of a run in progress
+can be followed with tail -f.
+"""
+import json
+import resource
+import sys
+import time
+from contextlib import contextmanager
+from functools import partial
+from sklearn_crfsuite.trainer import LinePerIterationTrainer
+
+
+def peak_rss(who=resource.RUSAGE_SELF) -> int:
+    """Returns the peak resident set size, in bytes"""
+    rss = resource.getrusage(who).ru_maxrss
+    # kilobytes, except on macOS
+    return rss if sys.platform == "darwin" else rss * 1024
+
+
+class Telemetry:
+    """Writer of the events of a run to a file; without a file, a no-op"""
+    def __init__(self, ofile: str = None):
+        self._fho = open(ofile, "w") if ofile else None
+        self._start = time.perf_counter()
+
+    def write(self, event: str, **fields) -> None:
+        if self._fho is None:
+            return
+        record = {
+            "event": event,
+            "elapsed": round(time.perf_counter() - self._start, 6),
+            **fields,
+            "peak_rss": peak_rss(),
+            "peak_rss_children": peak_rss(resource.RUSAGE_CHILDREN),
+        }
+        self._fho.write(json.dumps(record) + "\n")
+        self._fho.flush()
+
+    @contextmanager
+    def timer(self, event: str, **fields):
+        """Writes an event with the seconds taken by the block it wraps"""
+        start = time.perf_counter()
+        yield
+        self.write(event, seconds=time.perf_counter() - start, **fields)
+
+    def close(self) -> None:
+        if self._fho is not None:
+            self._fho.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class TelemetryTrainer(LinePerIterationTrainer):
+    """Trainer that writes every iteration of crfsuite to a Telemetry"""
+    def __init__(
+            self,
+            algorithm=None,
+            params=None,
+            verbose=True,
+            telemetry=None,
+            phase=None):
+        super().__init__(algorithm=algorithm, params=params, verbose=verbose)
+        self.telemetry = telemetry or Telemetry()
+        # tells apart the iterations of several trainings of a run
+        self.phase = phase
+
+    def message(self, message):
+        # iterations are followed even when the log is not printed
+        if self.verbose:
+            super().message(message)
+        elif self.logparser.feed(message) == 'iteration':
+            self.on_iteration(
+                self.logparser.last_log, self.logparser.last_iteration)
+
+    def on_iteration(self, log, info):
+        if self.verbose:
+            super().on_iteration(log, info)
+        phase = {} if self.phase is None else {'phase': self.phase}
+        self.telemetry.write(
+            "iteration",
+            **phase,
+            num=info['num'],
+            loss=info.get('loss'),
+            gradient_norm=info.get('error_norm'),
+            feature_norm=info.get('feature_norm'),
+            active_features=info.get('active_features'),
+            linesearch_trials=info.get('linesearch_trials'),
+            seconds=info.get('time'),
+        )
+
+
+@contextmanager
+def recording(crf, telemetry: Telemetry):
+    """
+    Makes the sklearn_crfsuite.CRF crf write its training iterations to
+    telemetry within the block, and leaves its parameters as they were
+    after it (so that the model can still be pickled)
+    """
+    trainer_cls = crf.trainer_cls
+    crf.set_params(trainer_cls=partial(TelemetryTrainer, telemetry=telemetry))
+    try:
+        yield crf
+    finally:
+        crf.set_params(trainer_cls=trainer_cls)
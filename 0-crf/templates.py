@@ -0,0 +1,289 @@
+"""
+Feature templates for the CRF.
+
+Each template describes one or more features of a token::
+
+    bias            constant feature
+    BOS, EOS        first and last token of the sentence
+    lower           attribute of the current word
+    w[-1].lower     attribute of the word at a relative position
+    w[-2..2].lower  attribute of every word in a window
+    w[1]            the word itself
+    pos, pos[-1]    PoS tag (second column of the dataset)
+
+Word attributes are word, lower, isupper, istitle, isdigit, shape (Xxxdd),
+shortshape (Xxd), prefixN and suffixN (N from 1 to 9). Features are named
+like the hand-written ones ('word.lower()', '-1:word.lower()', 'postag').
+
+A list of templates is compiled once into Python functions specialised
+for it, so building the features of a token does not interpret the
+templates again.
+
+With hash_bits, string-valued features (name and value) are hashed into
+2**hash_bits buckets, named by their number, which bounds the number of
+attributes of the model whatever the size of the vocabulary. Boolean and
+constant features are not hashed.
+"""
+import re
+import sys
+from itertools import groupby
+from zlib import crc32
+
+DEFAULT_TEMPLATES = (
+    'bias',
+    'lower',
+    'suffix3',
+    'isupper',
+    'istitle',
+    'isdigit',
+    'pos',
+    'w[-1].lower',
+    'w[-1].istitle',
+    'w[-1].isupper',
+    'pos[-1]',
+    'BOS',
+    'w[1].lower',
+    'w[1].istitle',
+    'w[1].isupper',
+    'pos[1]',
+    'EOS',
+)
+
+# attribute: (feature name, expression over the word w)
+ATTRIBUTES = {
+    'word': ('word', 'w'),
+    'lower': ('word.lower()', 'w.lower()'),
+    'isupper': ('word.isupper()', 'w.isupper()'),
+    'istitle': ('word.istitle()', 'w.istitle()'),
+    'isdigit': ('word.isdigit()', 'w.isdigit()'),
+    'shape': ('word.shape', '_shape(w)'),
+    'shortshape': ('word.shortshape', '_short_shape(w)'),
+}
+BOOLEAN_ATTRIBUTES = {'isupper', 'istitle', 'isdigit'}
+CONSTANTS = {
+    'bias': (1.0, None),
+    'BOS': (True, 'i == 0'),
+    'EOS': (True, 'i == last'),
+}
+
+_TEMPLATE = re.compile(
+    r'(?:(?P<column>w|pos)'
+    r'(?:\[(?P<start>[+-]?\d+)(?:\.\.(?P<end>[+-]?\d+))?\])?)?'
+    r'(?:(?(column)\.)(?P<attribute>[a-z]+\d?))?$')
+_AFFIX = re.compile(r'(prefix|suffix)([1-9])$')
+
+
+def shape(word):
+    return ''.join(
+        'X' if c.isupper() else 'x' if c.islower() else 'd' if c.isdigit()
+        else c
+        for c in word)
+
+
+def short_shape(word):
+    return ''.join(c for c, _ in groupby(shape(word)))
+
+
+def default_templates(with_pos=False):
+    """Returns the templates of the hand-written CRFFeatures features"""
+    return tuple(
+        t for t in DEFAULT_TEMPLATES if with_pos or not t.startswith('pos'))
+
+
+def read_templates(ifile):
+    """
+    Reads templates from a file, one per line. Blank lines and lines
+    starting with # are ignored.
+    """
+    with open(ifile, encoding='utf-8') as fhi:
+        return tuple(
+            line.strip() for line in fhi
+            if line.strip() and not line.lstrip().startswith('#'))
+
+
+def load_templates(ifile):
+    """
+    Returns the templates of a file, checking that they are valid, or None
+    if no file is given. Exits with an error message otherwise.
+    """
+    if ifile is None:
+        return None
+    try:
+        templates = read_templates(ifile)
+        FeatureExtractor(templates)
+    except (IOError, ValueError) as err:
+        print(err, file=sys.stderr)
+        sys.exit(1)
+    return templates
+
+
+def _attribute(name):
+    if name in ATTRIBUTES:
+        return ATTRIBUTES[name]
+    match = _AFFIX.match(name)
+    if match is None:
+        return None
+    kind, n = match.groups()
+    if kind == 'prefix':
+        return f'word[:{n}]', f'w[:{n}]'
+    return f'word[-{n}:]', f'w[-{n}:]'
+
+
+def _parse(template):
+    """
+    Yields (name, value, condition) for every feature of a template. The
+    value is either a constant or a (column, offset, is_string) tuple,
+    where column is a word attribute expression or None for the PoS tag.
+    """
+    if template in CONSTANTS:
+        value, condition = CONSTANTS[template]
+        yield template, value, condition
+        return
+
+    match = _TEMPLATE.match(template)
+    if match is None or not template:
+        raise ValueError(f"invalid feature template: {template!r}")
+    column, start, end, attribute = match.group(
+        'column', 'start', 'end', 'attribute')
+
+    if column == 'pos':
+        if attribute is not None:
+            raise ValueError(f"invalid feature template: {template!r}")
+        name, expression, is_string = 'postag', None, True
+    else:
+        attribute = attribute or 'word'
+        if _attribute(attribute) is None:
+            raise ValueError(f"unknown word attribute in {template!r}")
+        name, expression = _attribute(attribute)
+        is_string = attribute not in BOOLEAN_ATTRIBUTES
+
+    start = int(start or 0)
+    end = start if end is None else int(end)
+    if end < start:
+        raise ValueError(f"empty window in {template!r}")
+
+    for offset in range(start, end + 1):
+        if offset < 0:
+            condition = f'i >= {-offset}'
+        elif offset > 0:
+            condition = f'i <= last - {offset}'
+        else:
+            condition = None
+        prefix = f'{offset:+d}:' if offset else ''
+        yield prefix + name, (expression, offset, is_string), condition
+
+
+class FeatureExtractor:
+    """
+    Features of a list of templates, compiled into two functions:
+    word_attributes(word), which returns the attributes of a word used by
+    any template, and assemble(n, columns, postags), which builds the
+    feature dicts of a sentence of n tokens from the columns of those
+    attributes and the PoS tags. With hash_bits, string attributes and PoS
+    tags are passed to assemble() as hashes (see hash_value()).
+
+    features lists the (name, value, condition) of every feature, in the
+    order of the dicts, with the value either a constant or a (column,
+    offset, is_string) tuple, where column is the index of a word
+    attribute column or None for the PoS tag.
+    """
+    def __init__(self, templates, hash_bits=None):
+        if hash_bits is not None and not 1 <= hash_bits <= 32:
+            raise ValueError("hash bits must be between 1 and 32")
+        self.templates = tuple(templates)
+        self.hash_bits = hash_bits
+        features = [
+            feature for t in self.templates for feature in _parse(t)]
+
+        expressions = []
+        self.uses_pos = False
+        self.features = []
+        for name, value, condition in features:
+            if isinstance(value, tuple):
+                expression, offset, is_string = value
+                if expression is None:
+                    self.uses_pos = True
+                    self.features.append(
+                        (name, (None, offset, is_string), condition))
+                    continue
+                if hash_bits is not None and is_string:
+                    expression = f"_crc32(({expression}).encode())"
+                if expression not in expressions:
+                    expressions.append(expression)
+                value = (expressions.index(expression), offset, is_string)
+            self.features.append((name, value, condition))
+        self.n_attributes = len(expressions)
+
+        lines = [
+            "def word_attributes(w):",
+            f"    return ({''.join(e + ', ' for e in expressions)})",
+            "",
+            "def assemble(n, columns, postags):",
+        ]
+        if expressions:
+            lines.append(
+                f"    {''.join(f'c{j}, ' for j in range(len(expressions)))}"
+                f"= columns")
+        lines += [
+            "    last = n - 1",
+            "    sent_features = []",
+            "    for i in range(n):",
+            "        features = {",
+        ]
+
+        def code(name, value):
+            """Returns the code of the key and the value of a feature"""
+            if not isinstance(value, tuple):
+                return repr(name), repr(value)
+            expression, offset, is_string = value
+            hashed = hash_bits is not None and is_string
+            if expression is None:
+                column = 'postags'
+            else:
+                if hashed:
+                    expression = f"_crc32(({expression}).encode())"
+                column = f'c{expressions.index(expression)}'
+            item = f"{column}[i{offset:+d}]" if offset else f"{column}[i]"
+            if not hashed:
+                return repr(name), item
+            # the hash of the value is mixed with the hash of the name, so
+            # each feature (offset included) spreads over all the buckets
+            mask = (1 << hash_bits) - 1
+            return f"str(({item} ^ {self.hash_value(name)}) & {mask})", "1.0"
+
+        # unconditional features up to the first conditional one go in the
+        # dict display, the rest are added in order, grouping consecutive
+        # features under the same condition
+        pos = 0
+        while pos < len(features) and features[pos][2] is None:
+            key, value = code(*features[pos][:2])
+            lines.append(f"            {key}: {value},")
+            pos += 1
+        lines.append("        }")
+        for condition, group in groupby(features[pos:], lambda f: f[2]):
+            indent = "        "
+            if condition is not None:
+                lines.append(f"        if {condition}:")
+                indent += "    "
+            for name, value, _ in group:
+                key, value = code(name, value)
+                lines.append(f"{indent}features[{key}] = {value}")
+        lines += [
+            "        sent_features.append(features)",
+            "    return sent_features",
+        ]
+        self.source = "\n".join(lines) + "\n"
+
+        namespace = {
+            '_shape': shape,
+            '_short_shape': short_shape,
+            '_crc32': crc32,
+        }
+        exec(compile(self.source, '<feature templates>', 'exec'), namespace)
+        self.word_attributes = namespace['word_attributes']
+        self.assemble = namespace['assemble']
+
+    @staticmethod
+    def hash_value(value):
+        """Returns the (stable across runs) hash of a string"""
+        return crc32(value.encode())
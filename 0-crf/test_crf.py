@@ -1,11 +1,11 @@
 import argparse
-import pickle
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import classification_report
 from seqeval.metrics import classification_report as seq_classification_report
 from itertools import chain
 from IOB import IOB
-from features import CRFFeatures
+from features import add_feature_arguments, features_from_args
+from crfsuite_model import load_crf
 from config import version, test_size, random_state, shuffle
 
 
@@ -22,20 +22,14 @@ def parse_args():
         action='version',
         version=f'%(prog)s {version}'
     )
-    parser.add_argument(
-        '-p',
-        '--with-pos',
-        action='store_true',
-        default=False,
-        help='use POS tags as feature'
-    )
+    add_feature_arguments(parser)
     parser.add_argument(
         '-m',
         '--model',
         default='crf.model',
         type=str,
         metavar='FILE',
-        help='model file'
+        help='model file (pickle or crfsuite format)'
     )
     parser.add_argument(
         'dataset',
@@ -51,19 +45,19 @@ def flatten(y):
 
 
 args = parse_args()
-iob = IOB()
-feats = CRFFeatures(with_pos=args.with_pos)
-crf = pickle.load(open(args.model, 'rb'))
+iob = IOB(cache=True, compact=True)
+feats = features_from_args(args)
+crf = load_crf(args.model)
 
-sentences = iob.parse_file(args.dataset)
-train, test = train_test_split(
-    sentences,
+train_ids, test_ids = train_test_split(
+    range(iob.count_sentences(args.dataset)),
     test_size=test_size,
     random_state=random_state,
     shuffle=shuffle
 )
+test = iob.parse_sentences(args.dataset, test_ids)
 
-X_test = [feats.sent2features(s) for s in test]
+X_test = feats.sents2features(test)
 y_test = [feats.sent2labels(s) for s in test]
 
 y_pred = crf.predict(X_test)
@@ -1,10 +1,18 @@
 import argparse
+import os
 import pickle
+import sys
+import time
 import sklearn_crfsuite
 from itertools import chain
 from sklearn.model_selection import train_test_split
 from IOB import IOB
-from features import CRFFeatures
+from features import add_feature_arguments, features_from_args
+from early_stopping import fit_early_stopping
+from warm_start import warm_start
+from crfsuite_model import save_crfsuite_model
+from telemetry import Telemetry, recording
+from perceptron import AveragedPerceptron
 from config import (
     version, test_size, random_state, shuffle,
     c1, c2, max_iterations, all_possible_transitions
@@ -31,12 +39,68 @@ def parse_args():
         default=False,
         help='verbose'
     )
+    add_feature_arguments(parser)
     parser.add_argument(
-        '-p',
-        '--with-pos',
+        '-w',
+        '--workers',
+        type=int,
+        default=1,
+        help='number of processes used to compute the features',
+    )
+    parser.add_argument(
+        '-b',
+        '--backend',
+        choices=['crfsuite', 'perceptron'],
+        default='crfsuite',
+        help='learner: a CRF trained with L-BFGS by crfsuite, or a '
+             'structured averaged perceptron in NumPy, much faster to '
+             'train',
+    )
+    parser.add_argument(
+        '--epochs',
+        default=10,
+        type=int,
+        metavar='N',
+        help='with the perceptron backend, number of passes over the '
+             'training data',
+    )
+    parser.add_argument(
+        '-e',
+        '--early-stopping',
         action='store_true',
         default=False,
-        help='use POS tags as feature'
+        help='evaluate on the test split during training, stop when its '
+             'entity F1 stops improving and keep the best checkpoint',
+    )
+    parser.add_argument(
+        '--eval-every',
+        default=5,
+        type=int,
+        metavar='N',
+        help='with early stopping, iterations between evaluations',
+    )
+    parser.add_argument(
+        '--patience',
+        default=3,
+        type=int,
+        metavar='N',
+        help='with early stopping, evaluations without improvement before '
+             'stopping',
+    )
+    parser.add_argument(
+        '--warm-start',
+        type=str,
+        metavar='MODEL',
+        help='continue training an existing model (trained with the same '
+             'features) on the dataset, which can hold only new sentences '
+             'or the old and new ones',
+    )
+    parser.add_argument(
+        '--warm-start-iterations',
+        default=20,
+        type=int,
+        metavar='N',
+        help='with warm start, maximum number of L-BFGS iterations',
     )
     parser.add_argument(
         '-o',
@@ -46,6 +110,22 @@ def parse_args():
         metavar='FILE',
         help='model output file',
     )
+    parser.add_argument(
+        '-n',
+        '--native-output',
+        type=str,
+        metavar='FILE',
+        help='also write the model in crfsuite format, which the other '
+             'scripts load faster than the pickle',
+    )
+    parser.add_argument(
+        '--telemetry',
+        type=str,
+        metavar='FILE',
+        help='write the featurization time, the loss, gradient norm, time '
+             'and active features of every iteration and the peak memory '
+             'use to FILE, as JSON lines',
+    )
     parser.add_argument(
         'dataset',
         metavar='input file',
@@ -56,24 +136,65 @@ def parse_args():
 
 
 args = parse_args()
-iob = IOB()
-feats = CRFFeatures(with_pos=args.with_pos)
-crf = sklearn_crfsuite.CRF(
-    algorithm='lbfgs',
-    c1=c1,
-    c2=c2,
-    max_iterations=max_iterations,
-    all_possible_transitions=all_possible_transitions,
-    verbose=args.verbose,
-)
+if args.eval_every < 1 or args.patience < 1:
+    print("Error: --eval-every and --patience must be positive numbers",
+          file=sys.stderr)
+    sys.exit(1)
+if args.warm_start and args.early_stopping:
+    print("Error: --warm-start and --early-stopping cannot be used together",
+          file=sys.stderr)
+    sys.exit(1)
+if args.backend == 'perceptron' and (
+        args.early_stopping or args.warm_start or args.native_output):
+    print("Error: --early-stopping, --warm-start and --native-output need "
+          "the crfsuite backend", file=sys.stderr)
+    sys.exit(1)
+if args.epochs < 1:
+    print("Error: --epochs must be a positive number", file=sys.stderr)
+    sys.exit(1)
+if args.warm_start_iterations < 1:
+    print("Error: --warm-start-iterations must be a positive number",
+          file=sys.stderr)
+    sys.exit(1)
+if args.warm_start:
+    try:
+        with open(args.warm_start, 'rb') as fhi:
+            crf = pickle.load(fhi)
+    except (OSError, pickle.UnpicklingError) as err:
+        print(err, file=sys.stderr)
+        sys.exit(1)
+    if not isinstance(crf, sklearn_crfsuite.CRF):
+        print(f"Error: {args.warm_start} is not a CRF model", file=sys.stderr)
+        sys.exit(1)
+    old_log = getattr(crf, 'training_log_', None)
+iob = IOB(cache=True, compact=True)
+feats = features_from_args(args)
+if args.backend == 'perceptron':
+    crf = AveragedPerceptron(
+        epochs=args.epochs, random_state=random_state, verbose=args.verbose)
+elif not args.warm_start:
+    crf = sklearn_crfsuite.CRF(
+        algorithm='lbfgs',
+        c1=c1,
+        c2=c2,
+        max_iterations=max_iterations,
+        all_possible_transitions=all_possible_transitions,
+        verbose=args.verbose,
+    )
 
-sentences = iob.parse_file(args.dataset)
-train, test = train_test_split(
-    sentences,
+# the split is done over sentence positions, so only the sentences that
+# are actually used are loaded
+n_sentences = iob.count_sentences(args.dataset)
+train_ids, test_ids = train_test_split(
+    range(n_sentences),
     test_size=test_size,
     random_state=random_state,
     shuffle=shuffle
 )
+train = iob.parse_sentences(args.dataset, train_ids)
+
+if args.verbose or args.early_stopping:
+    test = iob.parse_sentences(args.dataset, test_ids)
 
 if args.verbose:
     train_size = len(list(chain(*train)))
@@ -84,19 +205,89 @@ if args.verbose:
         train_size, "(%2.2f%%)" % ((train_size*100)/total))
     print(
         "train size (in sentences): ",
-        len(train), "(%2.2f%%)" % ((len(train)*100)/len(sentences)))
+        len(train), "(%2.2f%%)" % ((len(train)*100)/n_sentences))
     print(
         "test size (in tokens): ",
         test_size, "(%2.2f%%)" % ((test_size*100)/total))
     print(
         "test size (in sentences): ",
-        len(test), "(%2.2f%%)" % ((len(test)*100)/len(sentences)))
+        len(test), "(%2.2f%%)" % ((len(test)*100)/n_sentences))
     print("random_state: ", random_state)
     print("shuffle: ", shuffle)
     print()
 
-X_train = [feats.sent2features(s) for s in train]
+telemetry = Telemetry(args.telemetry)
+featurization = time.perf_counter()
+with telemetry.timer("featurization", split="train", sentences=len(train)):
+    X_train = feats.sents2features(train, args.workers)
+if args.verbose:
+    memo = feats.memo_info()
+    if memo.hits + memo.misses:
+        print(
+            "word attribute memo: %d hits, %d misses (%2.2f%%)" % (
+                memo.hits, memo.misses,
+                (memo.hits*100)/(memo.hits + memo.misses)))
 y_train = [feats.sent2labels(s) for s in train]
 
-crf.fit(X_train, y_train)
-pickle.dump(crf, open(args.output, 'wb'))
+if args.early_stopping:
+    with telemetry.timer("featurization", split="test", sentences=len(test)):
+        X_test = feats.sents2features(test, args.workers)
+    y_test = [feats.sent2labels(s) for s in test]
+featurization = time.perf_counter() - featurization
+
+training = time.perf_counter()
+if args.early_stopping:
+    crf, best, score, run, kept = fit_early_stopping(
+        crf, X_train, y_train, X_test, y_test,
+        every=args.eval_every, patience=args.patience,
+        telemetry=telemetry)
+    if args.verbose:
+        print()
+        print("iterations run: ", run)
+        print("best iteration: ", best, "(entity F1: %.4f)" % score)
+        print("model saved: iteration", kept)
+elif args.warm_start:
+    start = time.perf_counter()
+    crf, run = warm_start(
+        crf, X_train, y_train, iterations=args.warm_start_iterations,
+        telemetry=telemetry)
+    elapsed = time.perf_counter() - start
+    if args.verbose:
+        print("warm start iterations: ", run)
+        print("warm start time (in seconds): %.2f" % elapsed)
+        # models written by a warm start have no training log
+        if old_log is not None and old_log.iterations:
+            full = sum(info['time'] for info in old_log.iterations)
+            print(
+                "original training time (in seconds): %.2f" % full,
+                "(%d iterations)" % len(old_log.iterations))
+            print("time saved (in seconds): %.2f" % (full - elapsed))
+elif args.backend == 'perceptron':
+    crf.fit(X_train, y_train, telemetry=telemetry)
+else:
+    with recording(crf, telemetry):
+        crf.fit(X_train, y_train)
+training = time.perf_counter() - training
+with open(args.output, 'wb') as fho:
+    pickle.dump(crf, fho)
+if args.native_output:
+    save_crfsuite_model(crf, args.native_output)
+
+telemetry.write(
+    "run",
+    featurization_seconds=featurization,
+    training_seconds=training,
+    sentences=len(train),
+    model_attributes=len(crf.attributes_),
+    model_size=os.path.getsize(args.output),
+)
+telemetry.close()
+
+if args.verbose:
+    print()
+    print("model attributes: ", len(crf.attributes_))
+    print("model size (in bytes): ", os.path.getsize(args.output))
+    if args.native_output:
+        print(
+            "crfsuite model size (in bytes): ",
+            os.path.getsize(args.native_output))
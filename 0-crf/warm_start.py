@@ -0,0 +1,122 @@
+"""
+Warm-start training of a CRF from an existing model.
+
+crfsuite always starts training from zero weights, so the objective of
+crfsuite's L-BFGS training (negative log-likelihood plus c1 * |w| plus
+c2 * |w|^2) is optimised here with NumPy and SciPy's L-BFGS-B, starting
+from the weights of the existing model. L1 regularisation is handled by
+splitting each weight into a positive and a negative part, bounded at
+zero. The features are those of the old model plus the ones crfsuite
+would generate from the new data, and the result is written back as a
+crfsuite model.
+"""
+import time
+import numpy as np
+from scipy.optimize import minimize
+from crfsuite_model import model_bytes, read_model, to_crf, CRFSuiteModel
+from npcrf import Corpus, Vocabulary, log_likelihood, observed_features
+
+
+def warm_start(crf, X, y, iterations: int = 20, telemetry=None):
+    """
+    Returns a copy of the sklearn_crfsuite.CRF crf trained for up to the
+    given number of L-BFGS iterations on X, y, starting from its weights,
+    and the number of iterations run. The iterations are written to
+    telemetry, if given.
+    """
+    old = read_model(model_bytes(crf))
+    attributes = Vocabulary(old.attributes)
+    labels = Vocabulary(old.labels)
+    corpus = Corpus(X, attributes, y, labels, grow=True)
+    n_attrs, n_labels = len(attributes), len(labels)
+
+    state = np.zeros((n_attrs, n_labels))
+    state[:old.state.shape[0], :old.state.shape[1]] = old.state
+    transitions = np.zeros((n_labels, n_labels))
+    transitions[:len(old.labels), :len(old.labels)] = old.transitions
+
+    # features: the ones of the model and the ones of the new data
+    seen_state, seen_transitions = observed_features(corpus, n_labels)
+    if crf.all_possible_states:
+        seen_state[:] = True
+    if crf.all_possible_transitions:
+        seen_transitions[:] = True
+    state_ids = np.flatnonzero(seen_state | (state != 0))
+    transition_ids = np.flatnonzero(seen_transitions | (transitions != 0))
+    n_state = len(state_ids)
+    w0 = np.concatenate(
+        [state.flat[state_ids], transitions.flat[transition_ids]])
+
+    # crfsuite defaults
+    c1 = crf.c1 or 0.0
+    c2 = 1.0 if crf.c2 is None else crf.c2
+    options = {
+        "maxiter": iterations,
+        "ftol": 1e-5 if crf.delta is None else crf.delta,
+    }
+
+    def unpack(w):
+        state = np.zeros((n_attrs, n_labels))
+        state.flat[state_ids] = w[:n_state]
+        transitions = np.zeros((n_labels, n_labels))
+        transitions.flat[transition_ids] = w[n_state:]
+        return state, transitions
+
+    def objective(w):
+        ll, grad_state, grad_transitions = log_likelihood(corpus, *unpack(w))
+        grad = -np.concatenate([
+            grad_state.flat[state_ids], grad_transitions.flat[transition_ids]])
+        return -ll + c2 * (w @ w), grad + 2 * c2 * w
+
+    n = len(w0)
+    if c1 > 0:
+        def fun(x):
+            f, g = objective(x[:n] - x[n:])
+            return (f + c1 * x.sum(),
+                    np.concatenate([g + c1, -g + c1]))
+
+        def weights(x):
+            return x[:n] - x[n:]
+
+        x0 = np.concatenate([np.maximum(w0, 0), np.maximum(-w0, 0)])
+        bounds = [(0, None)] * (2 * n)
+    else:
+        fun = objective
+
+        def weights(x):
+            return x
+
+        x0 = w0
+        bounds = None
+
+    # the loss and gradient of an iteration are those of the last
+    # evaluation, the one of the accepted step
+    last = {}
+    tick = [time.perf_counter()]
+
+    def traced(x):
+        f, g = fun(x)
+        last.update(loss=f, gradient_norm=float(np.linalg.norm(g)))
+        return f, g
+
+    def callback(x):
+        now = time.perf_counter()
+        last['num'] = last.get('num', 0) + 1
+        telemetry.write(
+            "iteration",
+            num=last['num'],
+            loss=last['loss'],
+            gradient_norm=last['gradient_norm'],
+            feature_norm=float(np.linalg.norm(weights(x))),
+            active_features=int(np.count_nonzero(weights(x))),
+            seconds=now - tick[0],
+        )
+        tick[0] = now
+
+    result = minimize(
+        traced, x0, jac=True, method="L-BFGS-B", bounds=bounds,
+        options=options, callback=callback if telemetry else None)
+    w = weights(result.x)
+
+    model = CRFSuiteModel(labels.strings, attributes.strings, *unpack(w))
+    return to_crf(model, crf), result.nit
@@ -1,4 +1,5 @@
 import argparse
+import os
 import spacy
 import sys
 import warnings
@@ -6,44 +7,13 @@ from tqdm import tqdm
 
 warnings.filterwarnings("ignore")
 
+sys.path.insert(0, os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), os.pardir))
 
-class IOB:
-    def __init__(self, sep=" "):
-        self._sep = sep
+from iobtools import IOB as BaseIOB, IOBWriter  # noqa: E402
 
-    def parse_file(self, ifile):
-        return [
-            self._parse_sentence(raw)
-            for raw in self._read_sentences_from_file(ifile)
-        ]
-
-    def _parse_sentence(self, raw_sentence):
-        return [
-            tuple(token.split(self._sep))
-            for token in raw_sentence.strip().split("\n")
-        ]
-
-    def _read_sentences_from_file(self, ifile):
-        raw_sentence = ""
-        try:
-            with open(ifile) as fhi:
-                for line in fhi:
-                    if line == "\n":
-                        if raw_sentence == "":
-                            continue
-                        yield raw_sentence
-                        raw_sentence = ""
-                        continue
-
-                    if line:
-                        raw_sentence += line
-
-            if raw_sentence:
-                yield raw_sentence
-        except IOError as err:
-            print(err, file=sys.stderr)
-            sys.exit()
 
+class IOB(BaseIOB):
     @classmethod
     def token_to_iob(cls, token):
         return (
@@ -64,6 +34,14 @@ def parse_args():
         type=str,
         help='IOB input file',
     )
+    parser.add_argument(
+        '-o',
+        '--output',
+        type=str,
+        metavar='FILE',
+        help='output file (default: stdout); .gz, .bz2, .xz and .zst '
+             'files are compressed',
+    )
     parser.add_argument(
         '-m',
         '--model',
@@ -91,7 +69,5 @@ for tokens in tqdm(sentences):
         for token in nlp(spacy.tokens.Doc(nlp.vocab, tokens))
     ])
 
-for sent in predict:
-    for token in sent:
-        print(" ".join(token))
-    print()
+with IOBWriter(args.output) as writer:
+    writer.write_sentences(predict)
@@ -2,6 +2,7 @@
 Code adapted from https://github.com/huggingface/transformers
 """
 import logging
+import os
 import sys
 import datasets
 import numpy as np
@@ -23,6 +24,11 @@ from dataclasses import dataclass, field
 from datasets import ClassLabel, load_dataset
 from typing import Optional
 
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+from iobtools import IOBWriter  # noqa: E402
+
 
 check_min_version("4.25.0.dev0")
 require_version(
@@ -360,8 +366,6 @@ true_predictions = [
 ]
 
 sentences = predict_dataset.to_dict()['tokens']
-with open(data_args.output_file, 'w') as ofile:
-    for i, sentence in enumerate(sentences):
-        for j, token in enumerate(sentence):
-            print('{} {}'.format(token, true_predictions[i][j]), file=ofile)
-        print(file=ofile)
+with IOBWriter(data_args.output_file) as writer:
+    for sentence, tags in zip(sentences, true_predictions):
+        writer.write_tagged(sentence, tags)
@@ -29,6 +29,11 @@ import warnings
 import openai
 from transformers import GPT2TokenizerFast, logging as hf_logging
 
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+from iobtools import read_sentences  # noqa: E402
+
 
 SAFE_MARGIN = 250
 LIMIT_PER_REQUEST = 4000
@@ -75,32 +80,6 @@ hf_logging.set_verbosity(hf_logging.FATAL)
 warnings.filterwarnings('ignore')
 
 
-def read_sentences_from_file(ifile):
-    """
-    Read an IOB2 file and returns a generator with the sentences (one token
-    per line).
-    """
-    raw_sentence = ""
-    try:
-        with open(ifile, encoding="utf8") as fhi:
-            for line in fhi:
-                if line == "\n":
-                    if raw_sentence == "":
-                        continue
-                    yield raw_sentence
-                    raw_sentence = ""
-                    continue
-
-                if line:
-                    raw_sentence += line
-
-        if raw_sentence:
-            yield raw_sentence
-    except IOError as err:
-        print(err, file=sys.stderr)
-        sys.exit()
-
-
 def get_maxtokens(length):
     return LIMIT_PER_REQUEST - length - SAFE_MARGIN
 
@@ -231,15 +210,17 @@ sent_id = 0
 current_toks = 0
 batch = ''
 batch_nr = 1
-sentences = read_sentences_from_file(args.dataset)
+sentences = read_sentences(args.dataset)
 
 start_time = time.time()
 sum_tokens = 0
 sum_requests = 1
 
-for sent in sentences:
+for lines in sentences:
     sent_id += 1
-    tokens = [tokens.split(" ")[0] for tokens in sent.split('\n')]
+    sent = '\n'.join(lines) + '\n'
+    # the trailing '' keeps a blank line after each sentence in the prompt
+    tokens = [line.split(" ")[0] for line in lines] + ['']
     current_toks += len(tokenizer(sent)['input_ids'])
     length_prompt = len(tokenizer(instruction)['input_ids']) + current_toks
 
@@ -11,7 +11,8 @@ class DataLoader(object):
             filename,
             opt,
             vocab,
-            char_vocab):
+            char_vocab,
+            workers=1):
         self.opt = opt
         self.vocab = vocab
         self.char_vocab = char_vocab
@@ -23,7 +24,7 @@ class DataLoader(object):
             sent.update(
                 {'char': [list(tok) for tok in sent['token']]}
             ) or sent
-            for sent in iob.parse_file(filename)
+            for sent in iob.parse_file(filename, workers=workers)
         ]
 
         self.raw_data = data
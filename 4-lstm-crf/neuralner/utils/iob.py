@@ -1,45 +1,18 @@
+import os
 import sys
 
+sys.path.insert(0, os.path.join(
+    os.path.dirname(os.path.abspath(__file__)),
+    os.pardir, os.pardir, os.pardir))
 
-class IOB:
-    def __init__(self, sep=" "):
-        self._sep = sep
+from iobtools import IOB as BaseIOB, IOBWriter  # noqa: E402,F401
 
-    def parse_file(self, ifile):
-        return [
-            self._parse_sentence(raw)
-            for raw in self._read_sentences_from_file(ifile)
-        ]
 
-    def _parse_sentence(self, raw_sentence):
-        tuples = [
-            tuple(token.split(self._sep))
-            for token in raw_sentence.strip().split("\n")
-        ]
-        token, tag = zip(*tuples)
+class IOB(BaseIOB):
+    def _make_sentence(self, tokens):
+        token, tag = zip(*tokens)
 
         return {
             'token': list(token),
             'tag': list(tag)
         }
-
-    def _read_sentences_from_file(self, ifile):
-        raw_sentence = ""
-        try:
-            with open(ifile) as fhi:
-                for line in fhi:
-                    if line == "\n":
-                        if raw_sentence == "":
-                            continue
-                        yield raw_sentence
-                        raw_sentence = ""
-                        continue
-
-                    if line:
-                        raw_sentence += line
-
-            if raw_sentence:
-                yield raw_sentence
-        except IOError:
-            print("Unable to read file: " + ifile)
-            sys.exit()
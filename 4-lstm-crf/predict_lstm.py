@@ -11,6 +11,7 @@ from neuralner.trainer import Trainer
 from neuralner.utils import torch_utils, constant
 from neuralner.utils.vocab import Vocab
 from neuralner.utils.dataloader import DataLoader
+from neuralner.utils.iob import IOBWriter
 
 warnings.filterwarnings("ignore")
 
@@ -35,6 +36,14 @@ def parse_args():
         metavar='MODEL',
         help='model file',
     )
+    parser.add_argument(
+        '-o',
+        '--output',
+        type=str,
+        metavar='FILE',
+        help='output file (default: stdout); .gz, .bz2, .xz and .zst '
+             'files are compressed',
+    )
     parser.add_argument(
         '--seed',
         type=int,
@@ -45,6 +54,13 @@ def parse_args():
         action='store_true',
         default=torch.cuda.is_available(),
     )
+    parser.add_argument(
+        '-w',
+        '--workers',
+        type=int,
+        default=1,
+        help='number of processes used to parse the dataset',
+    )
 
     return parser.parse_args()
 
@@ -74,7 +90,8 @@ assert opt['vocab_size'] == vocab.size, "Vocab size must match that in the saved
 char_vocab = Vocab(os.path.join(model_dir, 'vocab_char.pkl'))
 assert opt['char_vocab_size'] == char_vocab.size, "Char vocab size must match that in the saved model."  # noqa
 
-batch = DataLoader(args.dataset, opt, vocab, char_vocab)
+batch = DataLoader(
+    args.dataset, opt, vocab, char_vocab, workers=args.workers)
 
 label2id = constant.TYPE_TO_ID_IOB
 id2label = dict([(v, k) for k, v in label2id.items()])
@@ -89,8 +106,7 @@ golden = batch.gold()
 words = batch.words()
 
 assert len(golden) == len(words) == len(predictions), "Dataset size mismatch."  # noqa
-for ws, gs, ps in zip(words, golden, predictions):
-    assert len(ws) == len(gs) == len(ps), "Example length mismatch."
-    for w, g, p in zip(ws, gs, ps):
-        print("{} {}".format(w, p))
-    print()
+with IOBWriter(args.output) as writer:
+    for ws, gs, ps in zip(words, golden, predictions):
+        assert len(ws) == len(gs) == len(ps), "Example length mismatch."
+        writer.write_tagged(ws, ps)
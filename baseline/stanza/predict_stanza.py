@@ -1,4 +1,5 @@
 import argparse
+import os
 import stanza
 import sys
 import warnings
@@ -6,43 +7,10 @@ from tqdm import tqdm
 
 warnings.filterwarnings("ignore")
 
+sys.path.insert(0, os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), os.pardir, os.pardir))
 
-class IOB:
-    def __init__(self, sep=" "):
-        self._sep = sep
-
-    def parse_file(self, ifile):
-        return [
-            self._parse_sentence(raw)
-            for raw in self._read_sentences_from_file(ifile)
-        ]
-
-    def _parse_sentence(self, raw_sentence):
-        return [
-            tuple(token.split(self._sep))
-            for token in raw_sentence.strip().split("\n")
-        ]
-
-    def _read_sentences_from_file(self, ifile):
-        raw_sentence = ""
-        try:
-            with open(ifile) as fhi:
-                for line in fhi:
-                    if line == "\n":
-                        if raw_sentence == "":
-                            continue
-                        yield raw_sentence
-                        raw_sentence = ""
-                        continue
-
-                    if line:
-                        raw_sentence += line
-
-            if raw_sentence:
-                yield raw_sentence
-        except IOError as err:
-            print(err, file=sys.stderr)
-            sys.exit()
+from iobtools import IOB, IOBWriter  # noqa: E402
 
 
 class Stanza:
@@ -97,6 +65,14 @@ def parse_args():
         type=str,
         help='IOB input file',
     )
+    parser.add_argument(
+        '-o',
+        '--output',
+        type=str,
+        metavar='FILE',
+        help='output file (default: stdout); .gz, .bz2, .xz and .zst '
+             'files are compressed',
+    )
     parser.add_argument(
         '-m',
         '--model',
@@ -123,7 +99,5 @@ for tokens in tqdm(sentences):
         for i, token in enumerate(nlp([tokens]))
     ])
 
-for sent in predict:
-    for token in sent:
-        print(" ".join(token))
-    print()
+with IOBWriter(args.output) as writer:
+    writer.write_sentences(predict)
@@ -0,0 +1,31 @@
+from iobtools.cache import CachedCorpus, build_cache, load_corpus
+from iobtools.compression import compression, open_output, open_text
+from iobtools.corpus import Corpus, Sentence
+from iobtools.index import SentenceIndex, build_index, load_index
+from iobtools.iob import IOB
+from iobtools.parallel import parse_parallel, shard_ranges
+from iobtools.reader import (
+    read_raw_sentences, read_sentences, split_sentences
+)
+from iobtools.writer import IOBWriter
+
+__all__ = [
+    'CachedCorpus',
+    'Corpus',
+    'IOB',
+    'IOBWriter',
+    'Sentence',
+    'SentenceIndex',
+    'build_cache',
+    'build_index',
+    'compression',
+    'load_corpus',
+    'load_index',
+    'open_output',
+    'open_text',
+    'parse_parallel',
+    'read_raw_sentences',
+    'read_sentences',
+    'shard_ranges',
+    'split_sentences',
+]
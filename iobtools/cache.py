@@ -0,0 +1,186 @@
+"""
+Binary columnar cache for IOB files.
+
+The first time a file is loaded, it is parsed and compiled into a sidecar
+file (``<ifile>.iobc``) with an interned string table, the ids of the
+fields of every token, in the layout of corpus.Sentence, and an array with
+the offset of every sentence. Later loads memory-map that file and only
+decode the string table: sentences are Sentence views over the ids in the
+mapped file, so no parsing is involved. The cache is rebuilt whenever the
+size or the mtime of the source file changes.
+
+Layout (native byte order, every section aligned to 8 bytes)::
+
+    header      magic, version, source size and mtime, number of
+                sentences, tokens and columns, separator length
+    separator   utf-8 bytes
+    vocab       (offset, length) of the string table
+    offsets     n_sents + 1 unsigned 64-bit integers
+    ids         n_tokens * columns unsigned 32-bit integers, token by token
+    table       utf-8 strings joined with newlines
+"""
+import mmap
+import os
+import struct
+from array import array
+from iobtools.corpus import Sentence
+from iobtools.reader import read_sentences
+
+MAGIC = b"IOBC"
+VERSION = 2
+SUFFIX = ".iobc"
+
+_HEADER = struct.Struct("=4sIQqQQII")
+_VOCAB = struct.Struct("=QQ")
+
+
+def cache_path(ifile: str) -> str:
+    """Returns the name of the cache file of an IOB file"""
+    return ifile + SUFFIX
+
+
+def _align(fho) -> None:
+    fho.write(b"\0" * (-fho.tell() % 8))
+
+
+def _source_key(ifile: str) -> tuple:
+    stat = os.stat(ifile)
+    return stat.st_size, stat.st_mtime_ns
+
+
+def build_cache(ifile: str, sep: str = " ") -> bool:
+    """
+    Parses an IOB file and writes its cache. Returns False if the file
+    cannot be cached (tokens with a different number of columns, or a
+    cache file that cannot be written).
+    """
+    size, mtime = _source_key(ifile)
+    offsets = array("Q", [0])
+    index = {}
+    ids = array("I")
+    width = None
+    n_tokens = 0
+
+    for lines in read_sentences(ifile):
+        for line in lines:
+            fields = line.split(sep)
+            if width is None:
+                width = len(fields)
+            elif len(fields) != width:
+                return False
+            for field in fields:
+                ids.append(index.setdefault(field, len(index)))
+        n_tokens += len(lines)
+        offsets.append(n_tokens)
+
+    table = "\n".join(index).encode("utf-8")
+    sep_bytes = sep.encode("utf-8")
+
+    ofile = cache_path(ifile)
+    tmpfile = f"{ofile}.{os.getpid()}.tmp"
+    try:
+        with open(tmpfile, "wb") as fho:
+            fho.write(_HEADER.pack(
+                MAGIC, VERSION, size, mtime, len(offsets) - 1, n_tokens,
+                width or 0, len(sep_bytes)))
+            fho.write(sep_bytes)
+            _align(fho)
+
+            # the table offset is only known once the arrays are written
+            vocab_pos = fho.tell()
+            fho.write(b"\0" * _VOCAB.size)
+
+            offsets.tofile(fho)
+            ids.tofile(fho)
+            _align(fho)
+
+            vocab = _VOCAB.pack(fho.tell(), len(table))
+            fho.write(table)
+            _align(fho)
+
+            fho.seek(vocab_pos)
+            fho.write(vocab)
+        os.replace(tmpfile, ofile)
+    except OSError:
+        try:
+            os.remove(tmpfile)
+        except OSError:
+            pass
+        return False
+    return True
+
+
+class CachedCorpus:
+    """
+    Read-only view over a memory-mapped cache file. Sentences are
+    corpus.Sentence objects backed by the ids in the file, which behave
+    like the lists of tuples returned by IOB.parse_file(), and all of them
+    share the strings of the interned table.
+    """
+    def __init__(self, ifile: str):
+        with open(ifile, "rb") as fhi:
+            self._mm = mmap.mmap(fhi.fileno(), 0, access=mmap.ACCESS_READ)
+        buf = memoryview(self._mm)
+
+        (magic, version, self.source_size, self.source_mtime, n_sents,
+         n_tokens, self._width, sep_len) = _HEADER.unpack_from(buf)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{ifile} is not a valid IOB cache")
+
+        pos = _HEADER.size
+        self.sep = bytes(buf[pos:pos + sep_len]).decode("utf-8")
+        pos += sep_len + (-(pos + sep_len) % 8)
+        start, length = _VOCAB.unpack_from(buf, pos)
+        pos += _VOCAB.size
+
+        end = pos + 8 * (n_sents + 1)
+        self._offsets = buf[pos:end].cast("Q")
+        self._ids = buf[end:end + 4 * n_tokens * self._width].cast("I")
+
+        self.vocab = bytes(buf[start:start + length]).decode("utf-8") \
+            .split("\n")
+        self.n_tokens = n_tokens
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError("sentence index out of range")
+        width = self._width
+        return Sentence(
+            self.vocab,
+            self._ids[self._offsets[i] * width:self._offsets[i + 1] * width],
+            width)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+
+def load_corpus(ifile: str, sep: str = " "):
+    """
+    Returns a CachedCorpus for an IOB file, building or refreshing its
+    cache when needed, or None if the file cannot be cached.
+    """
+    try:
+        key = _source_key(ifile)
+    except OSError:
+        return None
+
+    ofile = cache_path(ifile)
+    for _ in range(2):
+        try:
+            corpus = CachedCorpus(ofile)
+            if (corpus.sep == sep and
+                    (corpus.source_size, corpus.source_mtime) == key):
+                return corpus
+        except (OSError, ValueError, struct.error):
+            pass
+        if not build_cache(ifile, sep):
+            return None
+    return None
@@ -0,0 +1,108 @@
+"""
+Transparent compression support for IOB files.
+
+Input files are recognised by their magic bytes, whatever their name, and
+decompressed on the fly while they are read. Output files are compressed
+according to their extension. gzip, bzip2 and xz are supported through the
+standard library; zstd requires the zstandard package.
+"""
+import bz2
+import gzip
+import io
+import lzma
+import sys
+from contextlib import contextmanager
+
+BUFFER_SIZE = 1 << 20
+
+MAGIC = [
+    (b"\x1f\x8b", "gzip"),
+    (b"BZh", "bz2"),
+    (b"\xfd7zXZ\x00", "xz"),
+    (b"\x28\xb5\x2f\xfd", "zstd"),
+]
+SUFFIXES = {
+    ".gz": "gzip",
+    ".bz2": "bz2",
+    ".xz": "xz",
+    ".zst": "zstd",
+}
+
+
+def _zstandard():
+    try:
+        import zstandard
+    except ImportError:
+        print("Package zstandard is required for .zst files", file=sys.stderr)
+        sys.exit(1)
+    return zstandard
+
+
+def _zstd_reader(fhi):
+    reader = _zstandard().ZstdDecompressor().stream_reader(
+        fhi, read_size=BUFFER_SIZE, read_across_frames=True, closefd=False)
+    return io.BufferedReader(reader, BUFFER_SIZE)
+
+
+def _zstd_writer(ofile, mode, encoding):
+    return _zstandard().open(ofile, mode, encoding=encoding)
+
+
+DECOMPRESSORS = {
+    "gzip": lambda fhi: gzip.GzipFile(fileobj=fhi, mode="rb"),
+    "bz2": bz2.BZ2File,
+    "xz": lzma.LZMAFile,
+    "zstd": _zstd_reader,
+}
+OPENERS = {
+    "gzip": gzip.open,
+    "bz2": bz2.open,
+    "xz": lzma.open,
+    "zstd": _zstd_writer,
+}
+
+
+def _detect(head: bytes):
+    for magic, kind in MAGIC:
+        if head.startswith(magic):
+            return kind
+    return None
+
+
+def compression(ifile: str):
+    """
+    Returns the compression format of a file ("gzip", "bz2", "xz" or
+    "zstd"), or None for uncompressed files
+    """
+    with open(ifile, "rb") as fhi:
+        return _detect(fhi.read(8))
+
+
+@contextmanager
+def open_text(ifile: str, buffer_size: int = BUFFER_SIZE):
+    """
+    Opens a file for reading as utf-8 text, decompressing it on the fly if
+    needed. Compressed bytes are read from disk in blocks of buffer_size.
+    """
+    with open(ifile, "rb", buffering=buffer_size) as raw:
+        kind = _detect(raw.peek(8)[:8])
+        if kind is None:
+            with io.TextIOWrapper(raw, encoding="utf-8") as fhi:
+                yield fhi
+        else:
+            with DECOMPRESSORS[kind](raw) as stream, \
+                    io.TextIOWrapper(stream, encoding="utf-8") as fhi:
+                yield fhi
+
+
+def open_output(ofile: str):
+    """
+    Opens a file for writing as utf-8 text, compressed according to its
+    extension
+    """
+    kind = next(
+        (kind for ext, kind in SUFFIXES.items() if ofile.endswith(ext)),
+        None)
+    if kind is None:
+        return open(ofile, "w", encoding="utf-8")
+    return OPENERS[kind](ofile, "wt", encoding="utf-8")
@@ -0,0 +1,113 @@
+"""
+Compact in-memory representation of IOB corpora.
+
+All the strings of a corpus (words, PoS tags and NER tags) are stored once
+in a shared table, and every sentence keeps only a flat array with the ids
+of its fields. Sentences behave like the lists of tuples returned by
+IOB.parse_file(): sent[i] is a tuple with the fields of the i-th token.
+"""
+from array import array
+
+
+class Sentence:
+    """
+    Sequence of tokens backed by an array (or a memoryview) of string ids
+    """
+    __slots__ = ('_vocab', '_ids', '_width')
+
+    def __init__(self, vocab: list, ids: array, width: int):
+        self._vocab = vocab
+        self._ids = ids
+        self._width = width
+
+    def __repr__(self):
+        return f'Sentence({list(self)!r})'
+
+    def __reduce__(self):
+        # the ids of the sentences of a corpus cache are a view of the file
+        return Sentence, (self._vocab, array('I', self._ids), self._width)
+
+    def __len__(self):
+        return len(self._ids) // self._width if self._width else 0
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        length = len(self)
+        if i < 0:
+            i += length
+        if not 0 <= i < length:
+            raise IndexError("token index out of range")
+        start = i * self._width
+        return tuple(
+            map(self._vocab.__getitem__, self._ids[start:start + self._width])
+        )
+
+    def __iter__(self):
+        fields = iter(list(map(self._vocab.__getitem__, self._ids)))
+        return zip(*[fields] * self._width)
+
+    def __eq__(self, other):
+        try:
+            return len(self) == len(other) and all(
+                a == tuple(b) for a, b in zip(self, other))
+        except TypeError:
+            return NotImplemented
+
+    def column(self, n: int) -> list:
+        """Returns the n-th field of every token (n = -1 for the tags)"""
+        if not self._width:
+            return []
+        return list(map(
+            self._vocab.__getitem__, self._ids[n % self._width::self._width]))
+
+
+class Corpus:
+    """
+    List-like container of Sentence objects sharing one string table
+    """
+    __slots__ = ('vocab', '_index', '_sentences')
+
+    def __init__(self, sentences=()):
+        self.vocab = []
+        self._index = {}
+        self._sentences = []
+        for tokens in sentences:
+            self.append(tokens)
+
+    def __repr__(self):
+        return (f'Corpus with {len(self._sentences)} sentences and '
+                f'{len(self.vocab)} distinct strings')
+
+    def __len__(self):
+        return len(self._sentences)
+
+    def __getitem__(self, i):
+        return self._sentences[i]
+
+    def __iter__(self):
+        return iter(self._sentences)
+
+    def append(self, tokens: list) -> Sentence:
+        """
+        Adds a sentence, given as a list of tuples, and returns its compact
+        version
+        """
+        width = len(tokens[0]) if tokens else 0
+        index = self._index
+        ids = array('I')
+        for token in tokens:
+            if len(token) != width:
+                raise ValueError(
+                    "All the tokens of a sentence must have the same "
+                    f"number of fields: {tokens}")
+            for field in token:
+                fid = index.get(field)
+                if fid is None:
+                    fid = index[field] = len(self.vocab)
+                    self.vocab.append(field)
+                ids.append(fid)
+
+        sentence = Sentence(self.vocab, ids, width)
+        self._sentences.append(sentence)
+        return sentence
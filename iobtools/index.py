@@ -0,0 +1,157 @@
+"""
+Sentence offset index for IOB files.
+
+The index is a sidecar file (``<ifile>.idx``) with the byte range of every
+sentence of an IOB file, so any sentence can be read with one seek instead
+of parsing the file up to it. Like the corpus cache, it is rebuilt when the
+size or the mtime of the source file changes.
+
+Layout (native byte order)::
+
+    header      magic, version, source size and mtime, number of sentences
+    starts      n_sents unsigned 64-bit integers
+    ends        n_sents unsigned 64-bit integers
+"""
+import mmap
+import os
+import re
+import struct
+from array import array
+from itertools import chain
+from iobtools.compression import compression
+
+MAGIC = b"IOBI"
+VERSION = 1
+SUFFIX = ".idx"
+
+_HEADER = struct.Struct("=4sIQqQ")
+_SEPARATOR = re.compile(rb"\n(?:\r?\n)+")
+
+
+def index_path(ifile: str) -> str:
+    """Returns the name of the index file of an IOB file"""
+    return ifile + SUFFIX
+
+
+def _source_key(ifile: str) -> tuple:
+    stat = os.stat(ifile)
+    return stat.st_size, stat.st_mtime_ns
+
+
+def build_index(ifile: str) -> bool:
+    """
+    Scans an IOB file and writes the byte range of each sentence to its
+    index file. Returns False if the index cannot be written, or if the
+    file is compressed (offsets in a compressed stream cannot be seeked).
+    """
+    size, mtime = _source_key(ifile)
+    if compression(ifile) is not None:
+        return False
+    starts = array("Q")
+    ends = array("Q")
+
+    if size:
+        with open(ifile, "rb") as fhi, \
+                mmap.mmap(fhi.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            start = 0
+            separators = chain(
+                ((m.start(), m.end()) for m in _SEPARATOR.finditer(mm)),
+                [(size, size)])
+            for sep_start, sep_end in separators:
+                # whitespace-only runs are not sentences for the reader
+                if mm[start:sep_start].strip():
+                    starts.append(start)
+                    ends.append(sep_start)
+                start = sep_end
+
+    ofile = index_path(ifile)
+    tmpfile = f"{ofile}.{os.getpid()}.tmp"
+    try:
+        with open(tmpfile, "wb") as fho:
+            fho.write(_HEADER.pack(MAGIC, VERSION, size, mtime, len(starts)))
+            starts.tofile(fho)
+            ends.tofile(fho)
+        os.replace(tmpfile, ofile)
+    except OSError:
+        try:
+            os.remove(tmpfile)
+        except OSError:
+            pass
+        return False
+    return True
+
+
+class SentenceIndex:
+    """
+    Random access to the sentences of an IOB file through its index. The
+    source file is kept open until close() is called.
+    """
+    def __init__(self, ifile: str, sep: str = " "):
+        self.sep = sep
+        with open(index_path(ifile), "rb") as fhi:
+            (magic, version, self.source_size, self.source_mtime,
+             n_sents) = _HEADER.unpack(fhi.read(_HEADER.size))
+            if magic != MAGIC or version != VERSION:
+                raise ValueError(f"{index_path(ifile)} is not a valid index")
+            self._starts = array("Q")
+            self._starts.fromfile(fhi, n_sents)
+            self._ends = array("Q")
+            self._ends.fromfile(fhi, n_sents)
+        self._fhi = open(ifile, "rb")
+
+    def __len__(self):
+        return len(self._starts)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self) -> None:
+        self._fhi.close()
+
+    def raw(self, i: int) -> str:
+        """
+        Returns the i-th sentence as a raw string (one token per line)
+        """
+        self._fhi.seek(self._starts[i])
+        raw = self._fhi.read(self._ends[i] - self._starts[i]).decode("utf-8")
+        if "\r" in raw:
+            raw = raw.replace("\r\n", "\n")
+        return raw.strip()
+
+    def __getitem__(self, i: int) -> list:
+        sep = self.sep
+        return [tuple(line.split(sep)) for line in self.raw(i).split("\n")]
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def offset(self, i: int) -> int:
+        """Returns the byte offset of the i-th sentence"""
+        return self._starts[i]
+
+
+def load_index(ifile: str, sep: str = " "):
+    """
+    Returns a SentenceIndex for an IOB file, building or refreshing its
+    index when needed, or None if the index cannot be built.
+    """
+    try:
+        key = _source_key(ifile)
+    except OSError:
+        return None
+
+    for _ in range(2):
+        try:
+            index = SentenceIndex(ifile, sep)
+            if (index.source_size, index.source_mtime) == key:
+                return index
+            index.close()
+        except (OSError, ValueError, EOFError, struct.error):
+            pass
+        if not build_index(ifile):
+            return None
+    return None
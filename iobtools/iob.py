@@ -0,0 +1,127 @@
+from iobtools.cache import CachedCorpus, load_corpus
+from iobtools.corpus import Corpus
+from iobtools.index import load_index
+from iobtools.parallel import parse_parallel
+from iobtools.reader import read_sentences
+
+
+class IOB:
+    """
+    Class to manage IOB files
+    """
+    def __init__(
+            self,
+            sep: str = " ",
+            cache: bool = False,
+            compact: bool = False):
+        self._sep = sep
+        self._cache = cache
+        self._compact = compact
+        self._sources = {}
+
+    def __repr__(self):
+        return f'IOB object with separation char = "{self._sep}"'
+
+    def parse_file(self, ifile: str, workers: int = 1):
+        '''
+        Takes a filename and returns a nested list with tuples containing
+        the tokens. With workers > 1, files that are not read from the
+        cache are parsed in parallel by that number of processes. With the
+        compact option, a Corpus (a CachedCorpus with the cache) is
+        returned instead of a list.
+
+        >>> iob.parse_file("../datasets/test.iob")
+        [[('Não', 'O'), ('sei', 'O'), ('.', 'O')],
+         [('Não', 'O'), ('.', 'O')]]
+        '''
+        if self._cache and self._compact:
+            # the cache is already a compact corpus
+            corpus = load_corpus(ifile, self._sep)
+            if corpus is not None:
+                return corpus
+            sentences = self._parse_tokens(ifile, workers)
+        else:
+            sentences = self._read_tokens(ifile, workers)
+        if self._compact:
+            return Corpus(sentences)
+        return [self._make_sentence(tokens) for tokens in sentences]
+
+    def iter_file(self, ifile: str):
+        """Same as parse_file(), but yields one sentence at a time"""
+        for tokens in self._read_tokens(ifile):
+            yield self._make_sentence(tokens)
+
+    def count_sentences(self, ifile: str) -> int:
+        """
+        Returns the number of sentences of a file, without parsing it when
+        it has a cache or an index
+        """
+        return len(self._random_access(ifile))
+
+    def parse_sentences(self, ifile: str, ids):
+        """
+        Same as parse_file(), but only returns the sentences at the given
+        positions, in the same order as ids (as a list of the sentences of
+        the cache with the compact and cache options). The rest of the file
+        is not parsed, so any subset of a corpus can be loaded without
+        holding the whole corpus in memory.
+        """
+        source = self._random_access(ifile)
+        ids = list(ids)
+
+        # sentences are read in file order to keep disk access sequential
+        tokens = [None] * len(ids)
+        for pos in sorted(range(len(ids)), key=ids.__getitem__):
+            tokens[pos] = source[ids[pos]]
+
+        if self._compact:
+            if isinstance(source, CachedCorpus):
+                return tokens
+            return Corpus(tokens)
+        return [self._make_sentence(list(sent)) for sent in tokens]
+
+    def _random_access(self, ifile: str):
+        """
+        Returns a sequence of sentences supporting random access: the
+        corpus cache if enabled, the offset index otherwise
+        """
+        if ifile not in self._sources:
+            source = None
+            if self._cache:
+                source = load_corpus(ifile, self._sep)
+            if source is None:
+                source = load_index(ifile, self._sep)
+            if source is None:
+                source = list(self._read_tokens(ifile))
+            self._sources[ifile] = source
+        return self._sources[ifile]
+
+    def _read_tokens(self, ifile: str, workers: int = 1):
+        if self._cache:
+            corpus = load_corpus(ifile, self._sep)
+            if corpus is not None:
+                yield from map(list, corpus)
+                return
+        yield from self._parse_tokens(ifile, workers)
+
+    def _parse_tokens(self, ifile: str, workers: int = 1):
+        """
+        Parses a file without the cache, in parallel with workers > 1 (also
+        when the cache is enabled but the file cannot be cached)
+        """
+        if workers > 1:
+            sentences = parse_parallel(ifile, self._sep, workers)
+            if sentences is not None:
+                yield from sentences
+                return
+
+        for lines in read_sentences(ifile):
+            yield self._parse_sentence(lines)
+
+    def _parse_sentence(self, lines: list) -> list:
+        sep = self._sep
+        return [tuple(line.split(sep)) for line in lines]
+
+    def _make_sentence(self, tokens: list):
+        """Hook for subclasses that need a different sentence shape"""
+        return tokens
@@ -0,0 +1,95 @@
+"""
+Parallel parsing of large IOB files.
+
+The file is split into byte ranges that start and end on blank lines, so
+no sentence is cut in two, and every range is parsed in its own process.
+"""
+import io
+import multiprocessing
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from iobtools.compression import compression
+from iobtools.reader import BUFFER_SIZE, split_sentences
+
+
+def _next_boundary(fhi, pos: int):
+    """
+    Returns the offset of the first blank line found at or after pos, or
+    None if there are no more blank lines in the file.
+    """
+    fhi.seek(pos)
+    prev = b""
+    while True:
+        block = fhi.read(BUFFER_SIZE)
+        if not block:
+            return None
+        data = prev + block
+        found = [
+            i for i in (data.find(b"\n\n"), data.find(b"\n\r\n")) if i >= 0
+        ]
+        if found:
+            return pos - len(prev) + min(found) + 1
+        pos += len(block)
+        prev = data[-2:]
+
+
+def shard_ranges(ifile: str, shards: int) -> list:
+    """
+    Splits a file into up to `shards` (start, end) byte ranges aligned to
+    sentence boundaries
+    """
+    size = os.path.getsize(ifile)
+    bounds = [0]
+    with open(ifile, "rb") as fhi:
+        for k in range(1, shards):
+            pos = _next_boundary(fhi, max(size * k // shards, bounds[-1]))
+            if pos is None:
+                break
+            if pos > bounds[-1]:
+                bounds.append(pos)
+    bounds.append(size)
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+def _parse_shard(job: tuple) -> list:
+    ifile, start, end, sep = job
+    with open(ifile, "rb") as fhi:
+        fhi.seek(start)
+        text = fhi.read(end - start).decode("utf-8")
+
+    # interned fields are pickled once per shard instead of once per token
+    intern = sys.intern
+    return [
+        [tuple(map(intern, line.split(sep))) for line in raw.split("\n")]
+        for raw in split_sentences(io.StringIO(text, newline=None))
+    ]
+
+
+def parse_parallel(ifile: str, sep: str = " ", workers: int = 2) -> list:
+    """
+    Parses an IOB file with a pool of processes and returns its sentences,
+    in file order, as lists of tuples. Returns None for compressed files,
+    which cannot be split, and on platforms where processes cannot be
+    forked.
+    """
+    # workers are forked so scripts are not imported again in every child
+    if "fork" not in multiprocessing.get_all_start_methods():
+        return None
+
+    try:
+        if compression(ifile) is not None:
+            return None
+        ranges = shard_ranges(ifile, workers)
+    except IOError as err:
+        print(err, file=sys.stderr)
+        sys.exit(1)
+
+    sentences = []
+    with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("fork")) as executor:
+        jobs = [(ifile, start, end, sep) for start, end in ranges]
+        for shard in executor.map(_parse_shard, jobs):
+            sentences += shard
+    return sentences
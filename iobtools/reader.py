@@ -0,0 +1,61 @@
+"""
+Shared reader for IOB files.
+
+Sentences are separated by one or more blank lines. The file is read in
+large blocks and every block is split on blank lines in one pass, so the
+cost of parsing is linear in the size of the input. Compressed files are
+decompressed on the fly.
+"""
+import sys
+from iobtools.compression import BUFFER_SIZE, open_text
+
+
+def split_sentences(fhi, buffer_size: int = BUFFER_SIZE):
+    """
+    Takes an open text file and yields its sentences as raw strings (one
+    token per line, without the trailing newline).
+    """
+    tail = ""
+    while True:
+        chunk = fhi.read(buffer_size)
+        if not chunk:
+            break
+        block = tail + chunk if tail else chunk
+
+        # everything up to the last blank line holds whole sentences
+        cut = block.rfind("\n\n")
+        if cut < 0:
+            tail = block
+            continue
+        tail = block[cut + 2:]
+
+        for raw in block[:cut].split("\n\n"):
+            raw = raw.strip()
+            if raw:
+                yield raw
+
+    tail = tail.strip()
+    if tail:
+        yield tail
+
+
+def read_raw_sentences(ifile: str, buffer_size: int = BUFFER_SIZE):
+    """
+    Read an IOB file and yield its sentences as raw strings (one token per
+    line, without the trailing newline).
+    """
+    try:
+        with open_text(ifile, buffer_size) as fhi:
+            yield from split_sentences(fhi, buffer_size)
+    except IOError as err:
+        print(err, file=sys.stderr)
+        sys.exit(1)
+
+
+def read_sentences(ifile: str, buffer_size: int = BUFFER_SIZE):
+    """
+    Read an IOB file and yield its sentences as lists of lines.
+    """
+    for raw in read_raw_sentences(ifile, buffer_size):
+        yield raw.split("\n")
+
@@ -0,0 +1,79 @@
+"""
+Buffered writer for IOB files.
+
+Every sentence is formatted with a single join and the formatted text is
+kept in memory until the buffer is full, so writing a file costs a few
+large writes instead of one call per token. Output files ending in .gz,
+.bz2, .xz or .zst are compressed on the fly.
+"""
+import sys
+from iobtools.compression import BUFFER_SIZE, open_output
+
+
+class IOBWriter:
+    """
+    Writes sentences in IOB format to a file, or to stdout if no file is
+    given
+    """
+    def __init__(
+            self,
+            ofile: str = None,
+            sep: str = " ",
+            buffer_size: int = BUFFER_SIZE):
+        self._sep = sep
+        self._buffer_size = buffer_size
+        self._parts = []
+        self._size = 0
+
+        if ofile is None or ofile == '-':
+            self._fho = sys.stdout
+            self._close = False
+        else:
+            try:
+                self._fho = open_output(ofile)
+            except IOError as err:
+                print(err, file=sys.stderr)
+                sys.exit(1)
+            self._close = True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def write_sentence(self, tokens) -> None:
+        """Takes a sentence as a list of tuples (or lists) of strings"""
+        self._append_sentence("\n".join(map(self._sep.join, tokens)))
+
+    def write_tagged(self, words, tags) -> None:
+        """Takes a sentence as two parallel lists, with words and tags"""
+        self._append_sentence(
+            "\n".join(map(self._sep.join, zip(words, tags))))
+
+    def write_sentences(self, sentences) -> None:
+        for tokens in sentences:
+            self.write_sentence(tokens)
+
+    def _append_sentence(self, text: str) -> None:
+        text = text + "\n\n" if text else "\n"
+        self._parts.append(text)
+        self._size += len(text)
+        if self._size >= self._buffer_size:
+            self._write()
+
+    def _write(self) -> None:
+        if self._parts:
+            self._fho.write("".join(self._parts))
+            self._parts = []
+            self._size = 0
+
+    def flush(self) -> None:
+        """Writes the buffered sentences to the output"""
+        self._write()
+        self._fho.flush()
+
+    def close(self) -> None:
+        self.flush()
+        if self._close:
+            self._fho.close()
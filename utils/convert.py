@@ -1,15 +1,30 @@
 import argparse
+import os
 import pickle
+import shutil
+import sys
 import joblib
 
+# models of the perceptron backend are instances of a class of 0-crf
+sys.path.insert(0, os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), os.pardir, '0-crf'))
+
 
 def parse_args():
-    description = "Converts a pickle file into joblib"
+    description = "Converts a pickle file into joblib, or a pickled CRF " \
+                  "model into a crfsuite model file"
 
     parser = argparse.ArgumentParser(
         description=description,
         formatter_class=argparse.ArgumentDefaultsHelpFormatter
     )
+    parser.add_argument(
+        '-f',
+        '--format',
+        choices=['joblib', 'crfsuite'],
+        default='joblib',
+        help='output format'
+    )
     parser.add_argument(
         'pickle',
         metavar='input file',
@@ -17,10 +32,10 @@ def parse_args():
         help='pickle file'
     )
     parser.add_argument(
-        'joblib',
+        'output',
         metavar='output file',
         type=str,
-        help='joblib file'
+        help='joblib or crfsuite file'
     )
 
     return parser.parse_args()
@@ -28,4 +43,12 @@ def parse_args():
 
 args = parse_args()
 pfile = pickle.load(open(args.pickle, 'rb'))
-joblib.dump(pfile, args.joblib)
+if args.format == 'crfsuite':
+    if not hasattr(pfile, 'modelfile'):
+        print("Error: only models of the crfsuite backend can be converted "
+              "into crfsuite files", file=sys.stderr)
+        sys.exit(1)
+    # the model of a sklearn_crfsuite.CRF is the crfsuite file it wraps
+    shutil.copyfile(pfile.modelfile.name, args.output)
+else:
+    joblib.dump(pfile, args.output)
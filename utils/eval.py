@@ -3,6 +3,7 @@ Script that evaluates a IOB dataset using a gold standard
 """
 import argparse
 import csv
+import os
 import sys
 from itertools import chain
 import matplotlib.pyplot as plt
@@ -10,62 +11,16 @@ import seaborn as sns
 from seqeval.metrics import classification_report, accuracy_score
 from sklearn.metrics import confusion_matrix
 
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+from iobtools import IOB  # noqa: E402
+
 TAGS = [
     'B-LOC', 'I-LOC', 'B-MISC', 'I-MISC', 'B-ORG', 'I-ORG', 'B-PER', 'I-PER'
 ]
 
 
-class IOB:
-    """
-    Class to manage IOB files
-    """
-    def __init__(self, sep: str = " "):
-        self._sep = sep
-
-    def __repr__(self):
-        return f'IOB object with separation char = "{self._sep}"'
-
-    def parse_file(self, ifile: str) -> list:
-        '''
-        Takes a filename and returns a nested list with tuples containing
-        the tokens.
-
-        >>> iob.parse_file("../datasets/test.iob")
-        [[('Não', 'O'), ('sei', 'O'), ('.', 'O')], [('Não', 'O'), ('.', 'O')]]
-        '''
-        return [
-            self._parse_sentence(raw)
-            for raw in self._read_sentences_from_file(ifile)
-        ]
-
-    def _parse_sentence(self, raw_sentence: str) -> list:
-        return [
-            (token.split(self._sep))
-            for token in raw_sentence.strip().split("\n")
-        ]
-
-    def _read_sentences_from_file(self, ifile: str):
-        raw_sentence = ""
-        try:
-            with open(ifile, encoding="utf-8") as fhi:
-                for line in fhi:
-                    if line == "\n":
-                        if raw_sentence == "":
-                            continue
-                        yield raw_sentence
-                        raw_sentence = ""
-                        continue
-
-                    if line:
-                        raw_sentence += line
-
-            if raw_sentence:
-                yield raw_sentence
-        except IOError:
-            print("Unable to read file: " + ifile)
-            sys.exit()
-
-
 def parse_args() -> argparse.Namespace:
     """Parses script arguments"""
     description = "Eval model results comparing two IOB files."
@@ -180,13 +135,15 @@ def evaluate() -> None:
     Takes a dataset in IOB2 format and evaluates it against a gold standard
     """
     args = parse_args()
-    iob = IOB()
-
+    # only the gold standard is cached: it is evaluated against many
+    # prediction files, each of them read once
     golden_tags = [
-        [token[-1] for token in sent] for sent in iob.parse_file(args.golden)
+        [token[-1] for token in sent]
+        for sent in IOB(cache=True).parse_file(args.golden)
     ]
     dataset_tags = [
-        [token[-1] for token in sent] for sent in iob.parse_file(args.dataset)
+        [token[-1] for token in sent]
+        for sent in IOB().parse_file(args.dataset)
     ]
 
     if args.strict is False:
@@ -3,6 +3,7 @@ Compares two IOB2 datasets with NER tags (LOC, PER, ORG, MISC) and produces
 a confusion matrix.
 """
 import argparse
+import os
 import sys
 from itertools import chain
 import matplotlib.pyplot as plt
@@ -10,61 +11,17 @@ import numpy as np
 import seaborn as sns
 from sklearn.metrics import confusion_matrix
 
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+from iobtools import IOB  # noqa: E402
+
 
 TAGS = [
     'B-LOC', 'I-LOC', 'B-MISC', 'I-MISC', 'B-ORG', 'I-ORG', 'B-PER', 'I-PER'
 ]
 
 
-class IOB:
-    """
-    Class to manage IOB files
-    """
-    def __init__(self, ifile, sep=" "):
-        self._ifile = ifile
-        self._sep = sep
-
-    def convert_file(self):
-        '''
-        Takes a filename and returns a nested list with tuples containing
-        the tokens.
-
-        >>> iob.convert_file("../datasets/test.iob")
-        [[('Não', 'O'), ('sei', 'O'), ('.', 'O')], [('Não', 'O'), ('.', 'O')]]
-        '''
-        return [
-            self._parse_sentence(raw)
-            for raw in self._read_sentences_from_file(self._ifile)
-        ]
-
-    def _parse_sentence(self, raw_sentence):
-        return [
-            tuple(token.split(self._sep))
-            for token in raw_sentence.strip().split("\n")
-        ]
-
-    def _read_sentences_from_file(self, ifile):
-        raw_sentence = ""
-        try:
-            with open(ifile) as fhi:
-                for line in fhi:
-                    if line == "\n":
-                        if raw_sentence == "":
-                            continue
-                        yield raw_sentence
-                        raw_sentence = ""
-                        continue
-
-                    if line:
-                        raw_sentence += line
-
-            if raw_sentence:
-                yield raw_sentence
-        except IOError as err:
-            print(err, file=sys.stderr)
-            sys.exit()
-
-
 def parse_args():
     """Parses script arguments"""
     description = "Eval results from a NER"
@@ -114,11 +71,12 @@ def flatten(nested_list):
 
 
 args = parse_args()
+iob = IOB()
 golden_tags = [
-    [token[-1] for token in sent] for sent in IOB(args.golden).convert_file()
+    [token[-1] for token in sent] for sent in iob.parse_file(args.golden)
 ]
 dataset_tags = [
-    [token[-1] for token in sent] for sent in IOB(args.dataset).convert_file()
+    [token[-1] for token in sent] for sent in iob.parse_file(args.dataset)
 ]
 
 check(golden_tags, dataset_tags)
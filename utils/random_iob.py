@@ -3,9 +3,15 @@ The script splits an IOB2 file into batches of 10 sentences each, up
 to N (--number) sentences in total.
 """
 import argparse
+import os
 import sys
 import random
 
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+from iobtools import load_index, read_raw_sentences  # noqa: E402
+
 SENTENCES = 1500
 
 
@@ -34,49 +40,34 @@ def parse_args():
     return parser.parse_args()
 
 
-def read_sentences_from_file(ifile):
-    raw_sentence = ""
-    try:
-        with open(ifile) as fhi:
-            for line in fhi:
-                if line == "\n":
-                    if raw_sentence == "":
-                        continue
-                    yield raw_sentence
-                    raw_sentence = ""
-                    continue
-
-                if line:
-                    raw_sentence += line
-
-        if raw_sentence:
-            yield raw_sentence
-    except IOError as err:
-        print(err, file=sys.stderr)
-        sys.exit()
-
-
 args = parse_args()
-sents = []
-
-for sent in read_sentences_from_file(args.dataset):
-    sents.append(sent)
+index = load_index(args.dataset)
+if index is None:
+    # compressed files cannot be indexed, so they are read in full
+    sents = list(read_raw_sentences(args.dataset))
+    n_sents, get_sentence = len(sents), sents.__getitem__
+else:
+    n_sents, get_sentence = len(index), index.raw
 
-assert len(sents) >= args.number, (
+assert n_sents >= args.number, (
     "The value {args.number} must be <= the "
-    f"number of sentences in the corpus ({len(sents)})"
+    f"number of sentences in the corpus ({n_sents})"
 )
-random_sents = random.sample(sents, k=args.number)
+# only the sampled sentences are read from the file
+random_sents = [
+    get_sentence(i) for i in random.sample(range(n_sents), k=args.number)
+]
 
 num = 0
 for num in range(args.number//10):
     print(f'random_batch_{num}.iob')
     with open(f'random_batch_{num}.iob', 'w') as ofile:
-        ofile.write('\n'.join(random_sents[num * 10:(num*10)+10]) + '\n')
+        ofile.write(
+            '\n\n'.join(random_sents[num * 10:(num*10)+10]) + '\n\n')
 
 remain = args.number % 10
 if remain != 0:
     filename = f"random_batch_{num + 1 if num != 0 else 0}.iob"
     print(filename)
     with open(filename, 'w') as ofile:
-        ofile.write('\n'.join(random_sents[-remain:]) + '\n')
+        ofile.write('\n\n'.join(random_sents[-remain:]) + '\n\n')
@@ -9,9 +9,15 @@ sentence with an entity seen during training.
 The script generates two output files: 'unseen_test.iob' and 'seen_test.iob'.
 """
 import argparse
+import os
 import sys
 from collections import defaultdict
 
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+from iobtools import IOB  # noqa: E402
+
 
 class IOBChunk:
     def __init__(self, token, iob, tag):
@@ -33,37 +39,6 @@ class IOBChunk:
         return self
 
 
-def read_sentences_from_file(ifile):
-    """Read IOB sentences from file, one at a time"""
-    raw_sentence = ""
-    try:
-        with open(ifile) as fhi:
-            for line in fhi:
-                if line == "\n":
-                    if raw_sentence == "":
-                        continue
-                    yield raw_sentence.rstrip()
-                    raw_sentence = ""
-                    continue
-
-                if line:
-                    raw_sentence += line
-
-        # yield remaining contents if file does not end in '\n\n'
-        if raw_sentence:
-            yield raw_sentence.rstrip()
-    except IOError:
-        print("Unable to read file: " + ifile)
-        sys.exit()
-
-
-def get_dataset_from_file(ifile):
-    return [
-        [tuple(t.split(' ')) for t in sentence.split('\n')]
-        for sentence in read_sentences_from_file(ifile)
-    ]
-
-
 def merge_entities(data, only_ents=False):
     chunks = []
     entities = defaultdict(set)
@@ -128,7 +103,7 @@ def parse_args() -> argparse.Namespace:
 
 
 args = parse_args()
-train_sentences = get_dataset_from_file(args.train)
+train_sentences = IOB(cache=True, compact=True).parse_file(args.train)
 train_entities = defaultdict(set)
 for sent in train_sentences:
     ents = merge_entities(sent, only_ents=True)
@@ -138,7 +113,7 @@ for sent in train_sentences:
 
 n_sents = 0
 stats = defaultdict(int)
-test_sentences = get_dataset_from_file(args.test)
+test_sentences = IOB(cache=True, compact=True).parse_file(args.test)
 try:
     unseen = open("unseen_test.iob", "w")
     seen = open("seen_test.iob", "w")